@@ -6,11 +6,8 @@ customer support data, and network optimization using AI-powered insights.
 """
 
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from utils.snowflake_connection import get_snowflake_connection
+from utils.snowflake_connection import create_snowflake_session
 
 # Page configuration
 st.set_page_config(
@@ -21,7 +18,7 @@ st.set_page_config(
 )
 
 # Custom CSS for professional styling
-st.markdown("""
+CUSTOM_CSS = """
     <style>
     .main-header {
         font-size: 3rem;
@@ -75,7 +72,9 @@ st.markdown("""
         box-shadow: 0 5px 15px rgba(59, 130, 246, 0.4);
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 def display_header():
     """Display the main header section"""
@@ -83,42 +82,53 @@ def display_header():
     st.markdown('<p class="sub-header">Advanced Analytics for Network Performance & Customer Intelligence</p>', unsafe_allow_html=True)
     st.markdown("---")
 
+@st.cache_data(ttl=300, show_spinner=False)
 def fetch_dashboard_metrics():
-    """Fetch key metrics for the dashboard"""
+    """
+    Fetch key metrics for the dashboard
+    
+    Raises on failure so that an unavailable connection is not cached.
+    """
+    session = create_snowflake_session()
+    
+    # Fetch tower and ticket metrics in a single round-trip
+    metrics_query = """
+    SELECT 
+        'TOWER' as kind,
+        COUNT(DISTINCT CELL_TOWER_ID) as total,
+        AVG(FAILURE_RATE) as average,
+        COUNT_IF(FAILURE_RATE > 0.05) as flagged
+    FROM CELL_TOWERS
+    UNION ALL
+    SELECT 
+        'TICKET' as kind,
+        COUNT(*) as total,
+        AVG(SENTIMENT_SCORE) as average,
+        COUNT_IF(STATUS = 'OPEN') as flagged
+    FROM SUPPORT_TICKETS
+    WHERE TICKET_DATE >= DATEADD(day, -30, CURRENT_DATE())
+    """
+    # Read the two summary rows straight from Arrow, no DataFrame needed.
+    # The session is shared, so release the cursor once we are done.
+    with session.connection.cursor() as cur:
+        result = cur.execute(metrics_query).fetch_arrow_all()
+    rows = {row['KIND']: row for row in result.to_pylist()} if result is not None else {}
+    tower_metrics = rows.get('TOWER')
+    ticket_metrics = rows.get('TICKET')
+    
+    return {
+        'total_towers': int(tower_metrics['TOTAL']) if tower_metrics is not None else 0,
+        'avg_failure_rate': float(tower_metrics['AVERAGE'] or 0.0) if tower_metrics is not None else 0.0,
+        'high_risk_towers': int(tower_metrics['FLAGGED']) if tower_metrics is not None else 0,
+        'total_tickets': int(ticket_metrics['TOTAL']) if ticket_metrics is not None else 0,
+        'avg_sentiment': float(ticket_metrics['AVERAGE'] or 0.0) if ticket_metrics is not None else 0.0,
+        'open_tickets': int(ticket_metrics['FLAGGED']) if ticket_metrics is not None else 0
+    }
+
+def get_dashboard_metrics():
+    """Get key metrics for the dashboard, all zero if they cannot be fetched"""
     try:
-        conn = get_snowflake_connection()
-        
-        # Fetch cell tower metrics
-        tower_query = """
-        SELECT 
-            COUNT(DISTINCT CELL_TOWER_ID) as total_towers,
-            AVG(FAILURE_RATE) as avg_failure_rate,
-            SUM(CASE WHEN FAILURE_RATE > 0.05 THEN 1 ELSE 0 END) as high_risk_towers
-        FROM CELL_TOWERS
-        """
-        tower_metrics = conn.cursor().execute(tower_query).fetch_pandas_all()
-        
-        # Fetch support ticket metrics
-        ticket_query = """
-        SELECT 
-            COUNT(*) as total_tickets,
-            AVG(SENTIMENT_SCORE) as avg_sentiment,
-            COUNT(CASE WHEN STATUS = 'OPEN' THEN 1 END) as open_tickets
-        FROM SUPPORT_TICKETS
-        WHERE TICKET_DATE >= DATEADD(day, -30, CURRENT_DATE())
-        """
-        ticket_metrics = conn.cursor().execute(ticket_query).fetch_pandas_all()
-        
-        conn.close()
-        
-        return {
-            'total_towers': int(tower_metrics['TOTAL_TOWERS'].iloc[0]) if not tower_metrics.empty else 0,
-            'avg_failure_rate': float(tower_metrics['AVG_FAILURE_RATE'].iloc[0]) if not tower_metrics.empty else 0.0,
-            'high_risk_towers': int(tower_metrics['HIGH_RISK_TOWERS'].iloc[0]) if not tower_metrics.empty else 0,
-            'total_tickets': int(ticket_metrics['TOTAL_TICKETS'].iloc[0]) if not ticket_metrics.empty else 0,
-            'avg_sentiment': float(ticket_metrics['AVG_SENTIMENT'].iloc[0]) if not ticket_metrics.empty else 0.0,
-            'open_tickets': int(ticket_metrics['OPEN_TICKETS'].iloc[0]) if not ticket_metrics.empty else 0
-        }
+        return fetch_dashboard_metrics()
     except Exception as e:
         st.warning(f"Unable to fetch metrics: {str(e)}")
         return {
@@ -278,7 +288,7 @@ def main():
     
     # Fetch and display metrics
     with st.spinner("Loading dashboard metrics..."):
-        metrics = fetch_dashboard_metrics()
+        metrics = get_dashboard_metrics()
     
     display_kpi_metrics(metrics)
     display_features()
@@ -6,13 +6,12 @@ Interactive map interface for examining individual cell tower performance metric
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 import pydeck as pdk
-from datetime import datetime, timedelta
+from datetime import datetime
 from utils.snowflake_connection import get_snowflake_connection, execute_query
 from utils.visualizations import create_scatter_map, create_gauge_chart
-from utils.data_processing import calculate_failure_severity
+from utils.data_processing import calculate_failure_severity_vec, get_view_center
 
 # Page configuration
 st.set_page_config(
@@ -22,7 +21,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
     <style>
     .tower-card {
         background: white;
@@ -51,11 +50,18 @@ st.markdown("""
         color: #991B1B;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# Tower statuses in display order; colors in build_tower_deck follow this order
+STATUS_CATEGORIES = ['Operational', 'Warning', 'Critical', 'Maintenance']
+SEVERITY_CATEGORIES = ['Low', 'Medium', 'High', 'Critical']
+FLOAT32_COLUMNS = ['LATITUDE', 'LONGITUDE', 'FAILURE_RATE', 'SIGNAL_STRENGTH', 'COVERAGE_RADIUS']
 
 @st.cache_data(ttl=300)
 def load_cell_tower_data():
-    """Load cell tower data from Snowflake"""
+    """Load cell tower data from Snowflake along with the sidebar filter options"""
     query = """
     SELECT 
         CELL_TOWER_ID,
@@ -72,25 +78,46 @@ def load_cell_tower_data():
     """
     
     try:
-        df = execute_query(query)
-        if df is not None and not df.empty:
-            # Add severity calculation
-            df['SEVERITY'] = df.apply(
-                lambda row: calculate_failure_severity(row['FAILURE_RATE'], 0),
-                axis=1
-            )
-            return df
+        table = execute_query(query, as_arrow=True)
+        if table is not None and table.num_rows > 0:
+            # Convert column by column and free the Arrow buffers as we go
+            df = prepare_tower_data(table.to_pandas(split_blocks=True, self_destruct=True))
         else:
-            # Return sample data if database is not available
-            return generate_sample_data()
+            # Use sample data if database is not available
+            df = generate_sample_data()
     except Exception as e:
         st.warning(f"Using sample data: {str(e)}")
-        return generate_sample_data()
+        df = generate_sample_data()
+    
+    # Filter options are cached alongside the data
+    regions = ['All'] + sorted(df['REGION'].dropna().unique().tolist())
+    statuses = ['All'] + sorted(df['STATUS'].dropna().unique().tolist())
+    
+    return df, regions, statuses
+
+def prepare_tower_data(df):
+    """Add derived columns shared by the Snowflake and sample data paths"""
+    severity = calculate_failure_severity_vec(df['FAILURE_RATE'].to_numpy(), 0)
+    
+    # Metric columns don't need double precision for display or filtering
+    df = df.astype({col: 'float32' for col in FLOAT32_COLUMNS})
+    df['SEVERITY'] = pd.Categorical(severity, categories=SEVERITY_CATEGORIES, ordered=True)
+    
+    # Maintenance age is computed for all towers at once so details are a lookup
+    df['LAST_MAINTENANCE_DATE'] = pd.to_datetime(df['LAST_MAINTENANCE_DATE'])
+    df['DAYS_SINCE_MAINT'] = (pd.Timestamp.now() - df['LAST_MAINTENANCE_DATE']).dt.days
+    
+    # Low-cardinality labels are stored as categoricals
+    status = df['STATUS']
+    df['STATUS'] = pd.Categorical(status.where(status.isin(STATUS_CATEGORIES)), categories=STATUS_CATEGORIES)
+    df['REGION'] = df['REGION'].astype('category')
+    
+    return df
 
+@st.cache_data(show_spinner=False)
 def generate_sample_data():
     """Generate sample cell tower data for demonstration"""
-    import numpy as np
-    
+    rng = np.random.default_rng(42)
     n_towers = 150
     
     # Center around a sample location (e.g., San Francisco)
@@ -98,26 +125,20 @@ def generate_sample_data():
     
     data = {
         'CELL_TOWER_ID': [f'CT-{i:04d}' for i in range(1, n_towers + 1)],
-        'LATITUDE': np.random.normal(center_lat, 0.1, n_towers),
-        'LONGITUDE': np.random.normal(center_lon, 0.1, n_towers),
-        'FAILURE_RATE': np.random.beta(2, 50, n_towers),
-        'LAST_MAINTENANCE_DATE': [
-            datetime.now() - timedelta(days=int(x)) 
-            for x in np.random.exponential(30, n_towers)
-        ],
-        'SIGNAL_STRENGTH': np.random.uniform(-100, -50, n_towers),
-        'COVERAGE_RADIUS': np.random.uniform(0.5, 3.0, n_towers),
-        'STATUS': np.random.choice(['Operational', 'Warning', 'Critical'], n_towers, p=[0.7, 0.2, 0.1]),
-        'REGION': np.random.choice(['North', 'South', 'East', 'West'], n_towers)
+        'LATITUDE': rng.normal(center_lat, 0.1, n_towers),
+        'LONGITUDE': rng.normal(center_lon, 0.1, n_towers),
+        'FAILURE_RATE': rng.beta(2, 50, n_towers),
+        'LAST_MAINTENANCE_DATE': (
+            np.datetime64(datetime.now(), 'ns')
+            - rng.exponential(30, n_towers).astype('timedelta64[D]')
+        ),
+        'SIGNAL_STRENGTH': rng.uniform(-100, -50, n_towers),
+        'COVERAGE_RADIUS': rng.uniform(0.5, 3.0, n_towers),
+        'STATUS': rng.choice(['Operational', 'Warning', 'Critical'], n_towers, p=[0.7, 0.2, 0.1]),
+        'REGION': rng.choice(['North', 'South', 'East', 'West'], n_towers)
     }
     
-    df = pd.DataFrame(data)
-    df['SEVERITY'] = df.apply(
-        lambda row: calculate_failure_severity(row['FAILURE_RATE'], 0),
-        axis=1
-    )
-    
-    return df
+    return prepare_tower_data(pd.DataFrame(data))
 
 def display_tower_details(tower_data):
     """Display detailed information for selected tower"""
@@ -184,7 +205,7 @@ def display_tower_details(tower_data):
     
     # Maintenance information
     st.markdown("### 🔧 Maintenance Information")
-    days_since_maintenance = (datetime.now() - tower_data['LAST_MAINTENANCE_DATE']).days
+    days_since_maintenance = tower_data['DAYS_SINCE_MAINT']
     
     if days_since_maintenance > 60:
         st.warning(f"⚠️ Last maintenance was **{days_since_maintenance} days ago**. Maintenance recommended.")
@@ -193,30 +214,27 @@ def display_tower_details(tower_data):
     
     st.caption(f"Last Maintenance Date: {tower_data['LAST_MAINTENANCE_DATE'].strftime('%B %d, %Y')}")
 
-def display_tower_map(df, selected_tower_id=None):
-    """Display interactive map of cell towers"""
-    st.markdown("### 🗺️ Cell Tower Map")
-    
-    # Color mapping based on status
-    color_map = {
-        'Operational': [0, 255, 0, 160],
-        'Warning': [255, 165, 0, 160],
-        'Critical': [255, 0, 0, 160]
-    }
-    
-    df['color'] = df['STATUS'].map(color_map)
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_tower_deck(df, selected_tower_id=None):
+    """Build the tower map deck, reused while the filters and selection are unchanged"""
+    # Color mapping based on status codes (last row is used for unknown statuses)
+    status_colors = np.array([
+        [0, 255, 0, 160],
+        [255, 165, 0, 160],
+        [255, 0, 0, 160],
+        [128, 128, 128, 160],
+        [128, 128, 128, 160]
+    ], dtype=np.uint8)
+    status_codes = df['STATUS'].cat.codes.to_numpy()
     
     # Highlight selected tower
-    if selected_tower_id:
-        df['elevation'] = df['CELL_TOWER_ID'].apply(
-            lambda x: 1000 if x == selected_tower_id else 0
-        )
-    else:
-        df['elevation'] = 0
+    df = df.assign(
+        color=status_colors[status_codes].tolist(),
+        elevation=np.where(df['CELL_TOWER_ID'].to_numpy() == selected_tower_id, 1000, 0)
+    )
     
     # Calculate center
-    center_lat = df['LATITUDE'].mean()
-    center_lon = df['LONGITUDE'].mean()
+    center_lat, center_lon = get_view_center(df['LATITUDE'].to_numpy(), df['LONGITUDE'].to_numpy())
     
     # Create PyDeck layers
     scatter_layer = pdk.Layer(
@@ -249,7 +267,13 @@ def display_tower_map(df, selected_tower_id=None):
         }
     )
     
-    st.pydeck_chart(deck)
+    return deck
+
+def display_tower_map(df, selected_tower_id=None):
+    """Display interactive map of cell towers"""
+    st.markdown("### 🗺️ Cell Tower Map")
+    
+    st.pydeck_chart(build_tower_deck(df, selected_tower_id))
 
 def display_statistics(df):
     """Display overall statistics"""
@@ -279,7 +303,7 @@ def main():
     
     # Load data
     with st.spinner("Loading cell tower data..."):
-        df = load_cell_tower_data()
+        df, regions, statuses = load_cell_tower_data()
     
     if df is None or df.empty:
         st.error("No cell tower data available.")
@@ -293,11 +317,9 @@ def main():
     st.sidebar.header("🔍 Filter Options")
     
     # Region filter
-    regions = ['All'] + sorted(df['REGION'].unique().tolist())
     selected_region = st.sidebar.selectbox("Region", regions)
     
     # Status filter
-    statuses = ['All'] + sorted(df['STATUS'].unique().tolist())
     selected_status = st.sidebar.selectbox("Status", statuses)
     
     # Failure rate filter
@@ -306,13 +328,13 @@ def main():
         0.0, 100.0, 100.0, 0.5
     )
     
-    # Apply filters
-    filtered_df = df.copy()
+    # Apply filters as a single boolean mask
+    mask = df['FAILURE_RATE'].to_numpy() <= max_failure_rate / 100
     if selected_region != 'All':
-        filtered_df = filtered_df[filtered_df['REGION'] == selected_region]
+        mask &= df['REGION'].to_numpy() == selected_region
     if selected_status != 'All':
-        filtered_df = filtered_df[filtered_df['STATUS'] == selected_status]
-    filtered_df = filtered_df[filtered_df['FAILURE_RATE'] <= max_failure_rate / 100]
+        mask &= df['STATUS'].to_numpy() == selected_status
+    filtered_df = df[mask]
     
     st.sidebar.markdown(f"**Showing {len(filtered_df)} of {len(df)} towers**")
     
@@ -337,20 +359,22 @@ def main():
     st.markdown("---")
     st.markdown("### 📋 Tower Data Table")
     
-    # Format the dataframe for display
+    # Project the display columns (failure rate shown in percent) and let
+    # Streamlit format the numeric columns so they stay sortable
     display_df = filtered_df[[
         'CELL_TOWER_ID', 'REGION', 'STATUS', 'FAILURE_RATE',
         'SIGNAL_STRENGTH', 'COVERAGE_RADIUS', 'SEVERITY'
-    ]].copy()
-    
-    display_df['FAILURE_RATE'] = display_df['FAILURE_RATE'].apply(lambda x: f"{x:.2%}")
-    display_df['SIGNAL_STRENGTH'] = display_df['SIGNAL_STRENGTH'].apply(lambda x: f"{x:.1f} dBm")
-    display_df['COVERAGE_RADIUS'] = display_df['COVERAGE_RADIUS'].apply(lambda x: f"{x:.2f} km")
+    ]].assign(FAILURE_RATE=filtered_df['FAILURE_RATE'] * 100)
     
     st.dataframe(
         display_df,
         use_container_width=True,
-        hide_index=True
+        hide_index=True,
+        column_config={
+            "FAILURE_RATE": st.column_config.NumberColumn(format="%.2f%%"),
+            "SIGNAL_STRENGTH": st.column_config.NumberColumn(format="%.1f dBm"),
+            "COVERAGE_RADIUS": st.column_config.NumberColumn(format="%.2f km")
+        }
     )
 
 if __name__ == "__main__":
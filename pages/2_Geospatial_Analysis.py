@@ -7,13 +7,16 @@ Advanced heatmap overlays and correlation analysis for network performance
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
 import pydeck as pdk
 from datetime import datetime, timedelta
-from utils.snowflake_connection import execute_query
-from utils.data_processing import calculate_correlation, aggregate_metrics_by_region
-from utils.visualizations import create_scatter_plot, create_bar_chart
+from utils.snowflake_connection import get_snowflake_connection
+from utils.data_processing import (
+    calculate_correlation_matrix, aggregate_metrics_by_region, build_region_stats, get_view_center
+)
+from utils.visualizations import (
+    create_scatter_plot, create_bar_chart, preload_plotly_express, HEATMAP_COLOR_RANGE
+)
 
 # Page configuration
 st.set_page_config(
@@ -22,10 +25,17 @@ st.set_page_config(
     layout="wide"
 )
 
-@st.cache_data(ttl=300)
-def load_geospatial_data():
-    """Load combined cell tower and support ticket data"""
-    query = """
+# Towers joined with their ticket aggregate over the last 30 days
+GEOSPATIAL_QUERY = """
+    WITH recent_tickets AS (
+        SELECT 
+            CELL_TOWER_ID,
+            COUNT(TICKET_ID) as TICKET_COUNT,
+            AVG(SENTIMENT_SCORE) as AVG_SENTIMENT
+        FROM SUPPORT_TICKETS
+        WHERE TICKET_DATE >= DATEADD(day, -30, CURRENT_DATE())
+        GROUP BY CELL_TOWER_ID
+    )
     SELECT 
         ct.CELL_TOWER_ID,
         ct.LATITUDE,
@@ -33,80 +43,96 @@ def load_geospatial_data():
         ct.FAILURE_RATE,
         ct.REGION,
         ct.STATUS,
-        COUNT(st.TICKET_ID) as TICKET_COUNT,
-        AVG(st.SENTIMENT_SCORE) as AVG_SENTIMENT
+        COALESCE(rt.TICKET_COUNT, 0) as TICKET_COUNT,
+        rt.AVG_SENTIMENT
     FROM CELL_TOWERS ct
-    LEFT JOIN SUPPORT_TICKETS st ON ct.CELL_TOWER_ID = st.CELL_TOWER_ID
-    WHERE st.TICKET_DATE >= DATEADD(day, -30, CURRENT_DATE())
-    GROUP BY ct.CELL_TOWER_ID, ct.LATITUDE, ct.LONGITUDE, ct.FAILURE_RATE, ct.REGION, ct.STATUS
-    """
-    
+    LEFT JOIN recent_tickets rt ON ct.CELL_TOWER_ID = rt.CELL_TOWER_ID
+"""
+
+@st.cache_resource(ttl=300, show_spinner=False)
+def get_tower_ticket_table():
+    """Materialize the geospatial aggregate as a Snowpark temp table"""
+    session = get_snowflake_connection()
+    if session is None:
+        return None
+    return session.sql(GEOSPATIAL_QUERY).cache_result()
+
+@st.cache_data(ttl=300)
+def load_geospatial_data():
+    """Load combined cell tower and support ticket data"""
     try:
-        df = execute_query(query)
-        if df is not None and not df.empty:
-            return df
-        else:
-            return generate_sample_geospatial_data()
+        table = get_tower_ticket_table()
+        df = table.to_pandas() if table is not None else None
+        if df is None or df.empty:
+            df = generate_sample_geospatial_data()
     except Exception:
-        return generate_sample_geospatial_data()
+        df = generate_sample_geospatial_data()
+    
+    # Low-cardinality labels used as groupby keys are stored as categoricals
+    return df.astype({'REGION': 'category', 'STATUS': 'category'})
 
 def generate_sample_geospatial_data():
     """Generate sample geospatial data"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     n_towers = 200
     
     center_lat, center_lon = 37.7749, -122.4194
     
-    data = {
-        'CELL_TOWER_ID': [f'CT-{i:04d}' for i in range(1, n_towers + 1)],
-        'LATITUDE': np.random.normal(center_lat, 0.15, n_towers),
-        'LONGITUDE': np.random.normal(center_lon, 0.15, n_towers),
-        'FAILURE_RATE': np.random.beta(2, 50, n_towers),
-        'REGION': np.random.choice(['North', 'South', 'East', 'West', 'Central'], n_towers),
-        'STATUS': np.random.choice(['Operational', 'Warning', 'Critical'], n_towers, p=[0.7, 0.2, 0.1]),
-        'TICKET_COUNT': np.random.poisson(15, n_towers),
-        'AVG_SENTIMENT': np.random.beta(2, 2, n_towers) * 3 + 1  # 1-4 scale
-    }
-    
-    df = pd.DataFrame(data)
+    tower_ids = np.char.add('CT-', np.char.zfill(np.arange(1, n_towers + 1).astype('U4'), 4))
+    failure_rate = rng.beta(2, 50, n_towers)
     
     # Create correlation between failure rate and tickets
-    df['TICKET_COUNT'] = (df['TICKET_COUNT'] + df['FAILURE_RATE'] * 100).astype(int)
+    ticket_count = rng.poisson(15, n_towers) + failure_rate * 100
     
-    return df
+    data = {
+        'CELL_TOWER_ID': tower_ids,
+        'LATITUDE': rng.normal(center_lat, 0.15, n_towers),
+        'LONGITUDE': rng.normal(center_lon, 0.15, n_towers),
+        'FAILURE_RATE': failure_rate,
+        'REGION': rng.choice(['North', 'South', 'East', 'West', 'Central'], n_towers),
+        'STATUS': rng.choice(['Operational', 'Warning', 'Critical'], n_towers, p=[0.7, 0.2, 0.1]),
+        'TICKET_COUNT': ticket_count.astype(np.int32),
+        'AVG_SENTIMENT': rng.beta(2, 2, n_towers) * 3 + 1  # 1-4 scale
+    }
+    
+    return pd.DataFrame(data)
 
 def create_heatmap(df, metric='FAILURE_RATE', title='Heatmap'):
     """Create heatmap visualization"""
-    center_lat = df['LATITUDE'].mean()
-    center_lon = df['LONGITUDE'].mean()
+    center_lat, center_lon = get_view_center(df['LATITUDE'].to_numpy(), df['LONGITUDE'].to_numpy())
     
     # Normalize metric for heatmap intensity
-    df_copy = df.copy()
     max_val = df[metric].max()
-    if max_val > 0:
-        df_copy['weight'] = df[metric] / max_val
-    else:
-        df_copy['weight'] = 0
+    scale = 1.0 / max_val if max_val > 0 else 0.0
+    
+    # Each layer only gets the columns it reads, keeping the JSON payload small
+    heatmap_data = df[['LATITUDE', 'LONGITUDE']].assign(
+        weight=np.nan_to_num(df[metric].to_numpy() * scale)
+    )
+    scatter_data = df[['CELL_TOWER_ID', 'LATITUDE', 'LONGITUDE', metric]]
     
     # Create heatmap layer
     heatmap_layer = pdk.Layer(
         "HeatmapLayer",
-        data=df_copy,
+        data=heatmap_data,
         get_position="[LONGITUDE, LATITUDE]",
         get_weight="weight",
         radiusPixels=50,
         intensity=2,
         threshold=0.03,
+        colorRange=HEATMAP_COLOR_RANGE,
+        aggregation="SUM",
     )
     
     # Create scatter layer for reference
     scatter_layer = pdk.Layer(
         "ScatterplotLayer",
-        data=df_copy,
+        data=scatter_data,
         get_position="[LONGITUDE, LATITUDE]",
         get_radius=200,
         get_fill_color=[255, 255, 255, 100],
         pickable=True,
+        auto_highlight=True,
     )
     
     # Create deck
@@ -132,11 +158,14 @@ def display_correlation_analysis(df):
     """Display correlation analysis between metrics"""
     st.markdown("### 📈 Correlation Analysis")
     
+    # One pass over the three metrics gives both correlations
+    corr, pvals = calculate_correlation_matrix(df, ['FAILURE_RATE', 'TICKET_COUNT', 'AVG_SENTIMENT'])
+    
     col1, col2 = st.columns(2)
     
     with col1:
         # Failure Rate vs Ticket Count
-        corr1, pval1 = calculate_correlation(df, 'FAILURE_RATE', 'TICKET_COUNT')
+        corr1, pval1 = corr[0, 1], pvals[0, 1]
         
         fig1 = create_scatter_plot(
             df,
@@ -158,7 +187,7 @@ def display_correlation_analysis(df):
     
     with col2:
         # Failure Rate vs Sentiment
-        corr2, pval2 = calculate_correlation(df, 'FAILURE_RATE', 'AVG_SENTIMENT')
+        corr2, pval2 = corr[0, 2], pvals[0, 2]
         
         fig2 = create_scatter_plot(
             df,
@@ -178,6 +207,58 @@ def display_correlation_analysis(df):
         else:
             st.info(f"ℹ️ No significant correlation (r={corr2:.3f})")
 
+@st.cache_data(show_spinner=False)
+def get_worst_towers(df, top_n=10):
+    """Return the towers with the highest combined severity score"""
+    severity_score = (
+        df['FAILURE_RATE'].to_numpy() * 100 +
+        df['TICKET_COUNT'].to_numpy() / 10 +
+        (5 - df['AVG_SENTIMENT'].to_numpy())
+    )
+    # Towers without a score (no recent tickets) rank last
+    severity_score = np.nan_to_num(severity_score, nan=-np.inf)
+    
+    # Partial selection of the top N, then sort only those rows
+    top_n = min(top_n, len(df))
+    top_idx = np.argpartition(-severity_score, top_n - 1)[:top_n]
+    
+    return df.iloc[top_idx].assign(
+        severity_score=severity_score[top_idx]
+    ).sort_values('severity_score', ascending=False)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_region_stats():
+    """
+    Aggregate tower metrics per region inside Snowflake
+    Raises on failure so a transient error is not cached
+    """
+    table = get_tower_ticket_table()
+    if table is None:
+        raise RuntimeError("no Snowflake session")
+    region_stats = build_region_stats(table).to_pandas()
+    if region_stats.empty:
+        raise RuntimeError("region aggregation returned no rows")
+    return region_stats
+
+@st.cache_data(show_spinner=False)
+def compute_region_stats(df):
+    """Aggregate tower metrics per region from the loaded data"""
+    return df.groupby('REGION', observed=True).agg(
+        AVG_FAILURE_RATE=('FAILURE_RATE', 'mean'),
+        STD_FAILURE_RATE=('FAILURE_RATE', 'std'),
+        TOTAL_TICKETS=('TICKET_COUNT', 'sum'),
+        AVG_TICKETS=('TICKET_COUNT', 'mean'),
+        AVG_SENTIMENT=('AVG_SENTIMENT', 'mean'),
+        TOWER_COUNT=('CELL_TOWER_ID', 'count')
+    ).reset_index()
+
+def get_region_stats(df):
+    """Per-region tower metrics shared by the regional views, aggregated in Snowflake when connected"""
+    try:
+        return fetch_region_stats()
+    except Exception:
+        return compute_region_stats(df)
+
 def display_top_problematic_areas(df):
     """Display top problematic areas"""
     st.markdown("### ⚠️ Priority Areas")
@@ -187,35 +268,25 @@ def display_top_problematic_areas(df):
     with col1:
         st.markdown("#### Worst Performing Towers")
         
-        # Calculate combined severity score
-        df['severity_score'] = (
-            df['FAILURE_RATE'] * 100 +
-            df['TICKET_COUNT'] / 10 +
-            (5 - df['AVG_SENTIMENT'])
-        )
-        
-        top_worst = df.nlargest(10, 'severity_score')[[
+        top_worst = get_worst_towers(df)[[
             'CELL_TOWER_ID', 'REGION', 'FAILURE_RATE', 'TICKET_COUNT', 'AVG_SENTIMENT'
-        ]].copy()
-        
-        top_worst['FAILURE_RATE'] = top_worst['FAILURE_RATE'].apply(lambda x: f"{x:.2%}")
-        top_worst['AVG_SENTIMENT'] = top_worst['AVG_SENTIMENT'].apply(lambda x: f"{x:.2f}")
+        ]]
+        top_worst = top_worst.assign(
+            FAILURE_RATE=top_worst['FAILURE_RATE'].map("{:.2%}".format),
+            AVG_SENTIMENT=top_worst['AVG_SENTIMENT'].map("{:.2f}".format)
+        )
         
         st.dataframe(top_worst, use_container_width=True, hide_index=True)
     
     with col2:
         st.markdown("#### Highest Ticket Volume by Region")
         
-        region_tickets = df.groupby('REGION').agg({
-            'TICKET_COUNT': 'sum',
-            'FAILURE_RATE': 'mean',
-            'CELL_TOWER_ID': 'count'
-        }).reset_index()
-        
-        region_tickets.columns = ['REGION', 'TOTAL_TICKETS', 'AVG_FAILURE_RATE', 'TOWER_COUNT']
-        region_tickets = region_tickets.sort_values('TOTAL_TICKETS', ascending=False)
-        
-        region_tickets['AVG_FAILURE_RATE'] = region_tickets['AVG_FAILURE_RATE'].apply(lambda x: f"{x:.2%}")
+        region_tickets = get_region_stats(df)[[
+            'REGION', 'TOTAL_TICKETS', 'AVG_FAILURE_RATE', 'TOWER_COUNT'
+        ]].sort_values('TOTAL_TICKETS', ascending=False)
+        region_tickets = region_tickets.assign(
+            AVG_FAILURE_RATE=region_tickets['AVG_FAILURE_RATE'].map("{:.2%}".format)
+        )
         
         st.dataframe(region_tickets, use_container_width=True, hide_index=True)
         
@@ -232,17 +303,7 @@ def display_regional_comparison(df):
     """Display regional comparison metrics"""
     st.markdown("### 🌍 Regional Performance Comparison")
     
-    regional_stats = df.groupby('REGION').agg({
-        'FAILURE_RATE': ['mean', 'std'],
-        'TICKET_COUNT': ['sum', 'mean'],
-        'AVG_SENTIMENT': 'mean',
-        'CELL_TOWER_ID': 'count'
-    }).reset_index()
-    
-    regional_stats.columns = [
-        'REGION', 'AVG_FAILURE_RATE', 'STD_FAILURE_RATE',
-        'TOTAL_TICKETS', 'AVG_TICKETS', 'AVG_SENTIMENT', 'TOWER_COUNT'
-    ]
+    regional_stats = get_region_stats(df)
     
     # Create grouped bar chart
     fig = go.Figure()
@@ -272,11 +333,12 @@ def display_regional_comparison(df):
     st.plotly_chart(fig, use_container_width=True)
     
     # Display table
-    display_regional = regional_stats.copy()
-    display_regional['AVG_FAILURE_RATE'] = display_regional['AVG_FAILURE_RATE'].apply(lambda x: f"{x:.2%}")
-    display_regional['STD_FAILURE_RATE'] = display_regional['STD_FAILURE_RATE'].apply(lambda x: f"{x:.2%}")
-    display_regional['AVG_TICKETS'] = display_regional['AVG_TICKETS'].apply(lambda x: f"{x:.1f}")
-    display_regional['AVG_SENTIMENT'] = display_regional['AVG_SENTIMENT'].apply(lambda x: f"{x:.2f}")
+    display_regional = regional_stats.assign(
+        AVG_FAILURE_RATE=regional_stats['AVG_FAILURE_RATE'].map("{:.2%}".format),
+        STD_FAILURE_RATE=regional_stats['STD_FAILURE_RATE'].map("{:.2%}".format),
+        AVG_TICKETS=regional_stats['AVG_TICKETS'].map("{:.1f}".format),
+        AVG_SENTIMENT=regional_stats['AVG_SENTIMENT'].map("{:.2f}".format)
+    )
     
     st.dataframe(display_regional, use_container_width=True, hide_index=True)
 
@@ -285,7 +347,8 @@ def main():
     st.markdown("Visualize network performance patterns and customer impact across regions")
     st.markdown("---")
     
-    # Load data
+    # Load data while plotly.express imports in the background
+    preload_plotly_express()
     with st.spinner("Loading geospatial data..."):
         df = load_geospatial_data()
     
@@ -341,6 +404,7 @@ def main():
     
     # Regional comparison
     display_regional_comparison(df)
+    
 
 if __name__ == "__main__":
     main()
@@ -7,11 +7,9 @@ Leverage Snowflake Cortex for intelligent insights and predictive analytics
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from utils.snowflake_connection import execute_query, get_snowflake_connection
-from utils.visualizations import create_line_chart, create_bar_chart
+from utils.data_processing import calculate_z_scores
 
 # Page configuration
 st.set_page_config(
@@ -36,6 +34,13 @@ st.markdown("""
         border-radius: 8px;
         border-left: 4px solid #3B82F6;
     }
+    .prediction-row {
+        display: flex;
+        gap: 1rem;
+    }
+    .prediction-row .prediction-box {
+        flex: 1;
+    }
     </style>
 """, unsafe_allow_html=True)
 
@@ -47,7 +52,8 @@ def load_time_series_data():
         DATE_TRUNC('day', TICKET_DATE) as DATE,
         COUNT(*) as TICKET_COUNT,
         AVG(SENTIMENT_SCORE) as AVG_SENTIMENT,
-        COUNT(CASE WHEN STATUS = 'OPEN' THEN 1 END) as OPEN_TICKETS
+        COUNT(CASE WHEN STATUS = 'OPEN' THEN 1 END) as OPEN_TICKETS,
+        (COUNT(*) - AVG(COUNT(*)) OVER ()) / NULLIF(STDDEV(COUNT(*)) OVER (), 0) as Z_SCORE
     FROM SUPPORT_TICKETS
     WHERE TICKET_DATE >= DATEADD(day, -90, CURRENT_DATE())
     GROUP BY DATE_TRUNC('day', TICKET_DATE)
@@ -65,22 +71,23 @@ def load_time_series_data():
 
 def generate_sample_time_series():
     """Generate sample time series data"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     dates = pd.date_range(end=datetime.now(), periods=90, freq='D')
     
     # Generate trend with seasonality
-    trend = np.linspace(50, 80, 90)
-    seasonality = 10 * np.sin(np.linspace(0, 4 * np.pi, 90))
-    noise = np.random.normal(0, 5, 90)
+    trend = np.linspace(50, 80, 90, dtype=np.float32)
+    seasonality = 10 * np.sin(np.linspace(0, 4 * np.pi, 90, dtype=np.float32))
+    noise = rng.standard_normal(90, dtype=np.float32) * 5
     
     ticket_count = trend + seasonality + noise
-    ticket_count = np.maximum(ticket_count, 0).astype(int)
+    ticket_count = np.maximum(ticket_count, 0).astype(np.int32)
     
     data = {
         'DATE': dates,
         'TICKET_COUNT': ticket_count,
-        'AVG_SENTIMENT': np.random.beta(2, 2, 90) * 3 + 1,
-        'OPEN_TICKETS': (ticket_count * np.random.uniform(0.3, 0.7, 90)).astype(int)
+        'AVG_SENTIMENT': (rng.beta(2, 2, 90) * 3 + 1).astype(np.float32),
+        'OPEN_TICKETS': (ticket_count * rng.uniform(0.3, 0.7, 90)).astype(np.int32),
+        'Z_SCORE': calculate_z_scores(ticket_count).astype(np.float32)
     }
     
     return pd.DataFrame(data)
@@ -88,15 +95,18 @@ def generate_sample_time_series():
 def predict_future_tickets(df, days_ahead=7):
     """Simple linear prediction for future tickets"""
     # Use last 30 days for trend
-    recent_data = df.tail(30).copy()
-    recent_data['day_num'] = range(len(recent_data))
+    y = df['TICKET_COUNT'].to_numpy(dtype=np.float32)[-30:]
     
-    # Simple linear regression
-    coeffs = np.polyfit(recent_data['day_num'], recent_data['TICKET_COUNT'], 1)
+    # Simple linear regression (closed-form least squares)
+    x = np.arange(len(y), dtype=np.float32)
+    x_mean, y_mean = x.mean(), y.mean()
+    x_dev = x - x_mean
+    slope = (x_dev * (y - y_mean)).sum() / (x_dev ** 2).sum()
+    intercept = y_mean - slope * x_mean
     
     # Predict future
-    future_days = range(len(recent_data), len(recent_data) + days_ahead)
-    predictions = [coeffs[0] * day + coeffs[1] for day in future_days]
+    future_days = np.arange(len(y), len(y) + days_ahead)
+    predictions = slope * future_days + intercept
     
     future_dates = pd.date_range(
         start=df['DATE'].max() + timedelta(days=1),
@@ -109,55 +119,73 @@ def predict_future_tickets(df, days_ahead=7):
         'PREDICTED_TICKETS': np.maximum(predictions, 0)
     })
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_cortex_sentiment(text_sample):
+    """
+    Score text with Snowflake Cortex SENTIMENT
+    Errors are raised rather than returned so Streamlit does not cache them
+    """
+    session = get_snowflake_connection()
+    if not session:
+        raise RuntimeError("no Snowflake session")
+    
+    # Example Cortex sentiment analysis; the text is bound, not interpolated
+    query = """
+    SELECT SNOWFLAKE.CORTEX.SENTIMENT(?) as sentiment_score
+    """
+    result = session.sql(query, params=[text_sample]).to_pandas()
+    return result['SENTIMENT_SCORE'].iloc[0] if not result.empty else None
+
 def analyze_sentiment_with_cortex(text_sample):
     """
     Analyze sentiment using Snowflake Cortex
     Note: This requires Cortex Complete function to be available
     """
     try:
-        session = get_snowflake_connection()
-        if session:
-            # Example Cortex sentiment analysis
-            query = f"""
-            SELECT SNOWFLAKE.CORTEX.SENTIMENT('{text_sample}') as sentiment_score
-            """
-            result = session.sql(query).to_pandas()
-            return result['SENTIMENT_SCORE'].iloc[0] if not result.empty else None
+        return fetch_cortex_sentiment(text_sample)
     except Exception as e:
         st.warning(f"Cortex sentiment analysis not available: {str(e)}")
         return None
 
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_cortex_insights(context_data):
+    """
+    Ask the Snowflake Cortex LLM for insights on the given metrics
+    Errors are raised rather than returned so Streamlit does not cache them
+    """
+    session = get_snowflake_connection()
+    if not session:
+        raise RuntimeError("no Snowflake session")
+    
+    prompt = f"""
+    Analyze the following telecom network data and provide 3 key insights:
+    - Average failure rate: {context_data['avg_failure_rate']:.2%}
+    - Total support tickets: {context_data['total_tickets']}
+    - Average sentiment: {context_data['avg_sentiment']:.2f}
+    - High risk towers: {context_data['high_risk_towers']}
+    
+    Provide actionable recommendations for network optimization.
+    """
+    
+    query = """
+    SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) as insights
+    """
+    
+    result = session.sql(query, params=['mistral-large', prompt]).to_pandas()
+    return result['INSIGHTS'].iloc[0] if not result.empty else None
+
 def generate_insights_with_cortex(context_data):
     """
     Generate insights using Snowflake Cortex LLM
     Note: This requires Cortex Complete function
     """
     try:
-        session = get_snowflake_connection()
-        if session:
-            prompt = f"""
-            Analyze the following telecom network data and provide 3 key insights:
-            - Average failure rate: {context_data['avg_failure_rate']:.2%}
-            - Total support tickets: {context_data['total_tickets']}
-            - Average sentiment: {context_data['avg_sentiment']:.2f}
-            - High risk towers: {context_data['high_risk_towers']}
-            
-            Provide actionable recommendations for network optimization.
-            """
-            
-            query = f"""
-            SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                'mistral-large',
-                '{prompt}'
-            ) as insights
-            """
-            
-            result = session.sql(query).to_pandas()
-            return result['INSIGHTS'].iloc[0] if not result.empty else None
-    except Exception as e:
+        return fetch_cortex_insights(context_data)
+    except Exception:
         st.info("AI insights generation not available. Using rule-based insights.")
         return generate_rule_based_insights(context_data)
 
+@st.cache_data(ttl=300, show_spinner=False)
 def generate_rule_based_insights(context_data):
     """Generate insights using rule-based logic"""
     insights = []
@@ -194,6 +222,8 @@ def generate_rule_based_insights(context_data):
 
 def display_predictive_analytics(df):
     """Display predictive analytics dashboard"""
+    import plotly.graph_objects as go
+    
     st.markdown("### 🔮 Predictive Analytics")
     
     col1, col2 = st.columns([2, 1])
@@ -208,7 +238,7 @@ def display_predictive_analytics(df):
         fig = go.Figure()
         
         # Historical data
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=df['DATE'],
             y=df['TICKET_COUNT'],
             mode='lines',
@@ -217,7 +247,7 @@ def display_predictive_analytics(df):
         ))
         
         # Predictions
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=predictions['DATE'],
             y=predictions['PREDICTED_TICKETS'],
             mode='lines+markers',
@@ -264,14 +294,12 @@ def display_predictive_analytics(df):
 
 def display_anomaly_detection(df):
     """Display anomaly detection results"""
-    st.markdown("### 🎯 Anomaly Detection")
+    import plotly.graph_objects as go
     
-    # Calculate z-scores for ticket count
-    df_copy = df.copy()
-    df_copy['z_score'] = (df_copy['TICKET_COUNT'] - df_copy['TICKET_COUNT'].mean()) / df_copy['TICKET_COUNT'].std()
-    df_copy['is_anomaly'] = np.abs(df_copy['z_score']) > 2
+    st.markdown("### 🎯 Anomaly Detection")
     
-    anomalies = df_copy[df_copy['is_anomaly']]
+    # Z-scores for ticket count come precomputed with the data
+    anomalies = df[np.abs(df['Z_SCORE'].to_numpy()) > 2]
     
     col1, col2 = st.columns([2, 1])
     
@@ -279,16 +307,16 @@ def display_anomaly_detection(df):
         # Plot with anomalies highlighted
         fig = go.Figure()
         
-        fig.add_trace(go.Scatter(
-            x=df_copy['DATE'],
-            y=df_copy['TICKET_COUNT'],
+        fig.add_trace(go.Scattergl(
+            x=df['DATE'],
+            y=df['TICKET_COUNT'],
             mode='lines',
             name='Ticket Count',
             line=dict(color='#3B82F6')
         ))
         
         if not anomalies.empty:
-            fig.add_trace(go.Scatter(
+            fig.add_trace(go.Scattergl(
                 x=anomalies['DATE'],
                 y=anomalies['TICKET_COUNT'],
                 mode='markers',
@@ -310,9 +338,11 @@ def display_anomaly_detection(df):
         st.metric("Total Anomalies", len(anomalies))
         
         if not anomalies.empty:
-            recent_anomalies = anomalies.tail(5)[['DATE', 'TICKET_COUNT', 'z_score']]
-            recent_anomalies['DATE'] = recent_anomalies['DATE'].dt.strftime('%b %d')
-            recent_anomalies['z_score'] = recent_anomalies['z_score'].apply(lambda x: f"{x:.2f}")
+            recent_anomalies = anomalies.tail(5)[['DATE', 'TICKET_COUNT', 'Z_SCORE']]
+            recent_anomalies = recent_anomalies.assign(
+                DATE=recent_anomalies['DATE'].dt.strftime('%b %d'),
+                Z_SCORE=recent_anomalies['Z_SCORE'].map("{:.2f}".format)
+            )
             
             st.dataframe(recent_anomalies, use_container_width=True, hide_index=True)
         else:
@@ -341,38 +371,29 @@ def display_ai_insights():
         </div>
         """, unsafe_allow_html=True)
     
-    # Additional metrics
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("""
+    # Additional metrics, rendered as one row of cards
+    st.markdown("""
+    <div class="prediction-row">
         <div class="prediction-box">
             <h5>📈 Trend Analysis</h5>
             <p><strong>7-Day Trend:</strong> +5.2%</p>
             <p><strong>30-Day Trend:</strong> -2.1%</p>
             <p><em>Network performance shows short-term increase in incidents</em></p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
         <div class="prediction-box">
             <h5>🎯 Risk Assessment</h5>
             <p><strong>Current Risk Level:</strong> Medium</p>
             <p><strong>Risk Score:</strong> 6.3/10</p>
             <p><em>15 towers flagged for preventive maintenance</em></p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
         <div class="prediction-box">
             <h5>👥 Customer Impact</h5>
             <p><strong>Affected Customers:</strong> ~12,400</p>
             <p><strong>Sentiment Trend:</strong> Stable</p>
             <p><em>Proactive communication recommended</em></p>
         </div>
-        """, unsafe_allow_html=True)
+    </div>
+    """, unsafe_allow_html=True)
 
 def main():
     st.title("🤖 AI-Powered Analytics")
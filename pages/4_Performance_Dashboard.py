@@ -9,9 +9,10 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from utils.snowflake_connection import execute_query
 from utils.visualizations import create_line_chart, create_bar_chart, create_gauge_chart
+from utils.data_processing import rolling_mean, downsample_minmax, bin_envelope
 
 # Page configuration
 st.set_page_config(
@@ -20,36 +21,48 @@ st.set_page_config(
     layout="wide"
 )
 
-@st.cache_data(ttl=300)
+# Most points a trend trace sends to the browser; longer series are min/max downsampled
+MAX_TREND_POINTS = 1000
+
+# Storage types for the daily network metrics; none of them need float64 precision
+NETWORK_METRICS_DTYPES = {
+    'FAILURE_RATE': np.float32,
+    'AVG_SIGNAL_STRENGTH': np.float32,
+    'ACTIVE_TOWERS': np.int32,
+    'DOWNTIME_HOURS': np.float32
+}
+
+@st.cache_data(ttl=300, show_spinner=False)
 def load_dashboard_data():
-    """Load comprehensive dashboard data"""
+    """Load comprehensive dashboard data; callers derive new series locally rather than adding columns"""
     # Generate sample data for demonstration
-    return generate_sample_dashboard_data()
+    return generate_sample_dashboard_data(date.today())
 
-def generate_sample_dashboard_data():
-    """Generate comprehensive sample data"""
-    np.random.seed(42)
+@st.cache_data(max_entries=2, show_spinner=False)
+def generate_sample_dashboard_data(as_of):
+    """Generate comprehensive sample data; as_of (the current date) keys the cache so the date axis rolls over daily"""
+    rng = np.random.default_rng(42)
     
     # Time series data (last 90 days)
-    dates = pd.date_range(end=datetime.now(), periods=90, freq='D')
+    dates = pd.date_range(end=pd.Timestamp(as_of), periods=90, freq='D')
     
     # Network metrics over time
     network_metrics = pd.DataFrame({
         'DATE': dates,
-        'FAILURE_RATE': np.random.beta(2, 50, 90),
-        'AVG_SIGNAL_STRENGTH': np.random.normal(-75, 10, 90),
-        'ACTIVE_TOWERS': np.random.poisson(185, 90) + 10,
-        'DOWNTIME_HOURS': np.random.exponential(2, 90)
-    })
+        'FAILURE_RATE': rng.beta(2, 50, 90),
+        'AVG_SIGNAL_STRENGTH': rng.normal(-75, 10, 90),
+        'ACTIVE_TOWERS': rng.poisson(185, 90) + 10,
+        'DOWNTIME_HOURS': rng.exponential(2, 90)
+    }).astype(NETWORK_METRICS_DTYPES)
     
     # Regional performance
     regions = ['North', 'South', 'East', 'West', 'Central']
     regional_data = pd.DataFrame({
         'REGION': regions,
-        'AVG_FAILURE_RATE': np.random.beta(2, 50, 5),
-        'TOTAL_TOWERS': np.random.randint(30, 50, 5),
-        'AVG_TICKETS': np.random.poisson(300, 5),
-        'CUSTOMER_SATISFACTION': np.random.beta(8, 2, 5) * 5
+        'AVG_FAILURE_RATE': rng.beta(2, 50, 5),
+        'TOTAL_TOWERS': rng.integers(30, 50, 5),
+        'AVG_TICKETS': rng.poisson(300, 5),
+        'CUSTOMER_SATISFACTION': rng.beta(8, 2, 5) * 5
     })
     
     # Tower status distribution
@@ -69,14 +82,17 @@ def display_executive_summary(data):
     st.markdown("### 📊 Executive Summary")
     
     network_metrics = data['network_metrics']
-    latest = network_metrics.iloc[-1]
-    previous = network_metrics.iloc[-8]  # Week ago
+    # Read each column once as an array; [-1] is today, [-8] a week ago
+    failure_rate = network_metrics['FAILURE_RATE'].to_numpy()
+    active_towers = network_metrics['ACTIVE_TOWERS'].to_numpy()
+    signal_strength = network_metrics['AVG_SIGNAL_STRENGTH'].to_numpy()
+    downtime_hours = network_metrics['DOWNTIME_HOURS'].to_numpy()
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        current_failure = latest['FAILURE_RATE']
-        prev_failure = previous['FAILURE_RATE']
+        current_failure = failure_rate[-1]
+        prev_failure = failure_rate[-8]
         delta = ((current_failure - prev_failure) / prev_failure * 100) if prev_failure != 0 else 0
         
         st.metric(
@@ -87,8 +103,8 @@ def display_executive_summary(data):
         )
     
     with col2:
-        current_towers = latest['ACTIVE_TOWERS']
-        prev_towers = previous['ACTIVE_TOWERS']
+        current_towers = active_towers[-1]
+        prev_towers = active_towers[-8]
         
         st.metric(
             "Active Towers",
@@ -98,8 +114,8 @@ def display_executive_summary(data):
         )
     
     with col3:
-        avg_signal = latest['AVG_SIGNAL_STRENGTH']
-        prev_signal = previous['AVG_SIGNAL_STRENGTH']
+        avg_signal = signal_strength[-1]
+        prev_signal = signal_strength[-8]
         
         st.metric(
             "Avg Signal Quality",
@@ -109,8 +125,8 @@ def display_executive_summary(data):
         )
     
     with col4:
-        total_downtime = network_metrics.tail(7)['DOWNTIME_HOURS'].sum()
-        prev_downtime = network_metrics.iloc[-14:-7]['DOWNTIME_HOURS'].sum()
+        total_downtime = downtime_hours[-7:].sum()
+        prev_downtime = downtime_hours[-14:-7].sum()
         
         st.metric(
             "Weekly Downtime",
@@ -136,6 +152,7 @@ def display_trend_analysis(data):
     st.markdown("### 📈 Performance Trends")
     
     network_metrics = data['network_metrics']
+    dates = network_metrics['DATE'].to_numpy()
     
     # Create tabs for different metrics
     tab1, tab2, tab3 = st.tabs(["Network Health", "Signal Quality", "Downtime Analysis"])
@@ -145,16 +162,50 @@ def display_trend_analysis(data):
         
         with col1:
             # Failure rate over time
+            failure_pct = network_metrics['FAILURE_RATE'].to_numpy() * 100
             fig = go.Figure()
             
-            fig.add_trace(go.Scatter(
-                x=network_metrics['DATE'],
-                y=network_metrics['FAILURE_RATE'] * 100,
-                mode='lines',
-                name='Failure Rate',
-                line=dict(color='#EF4444', width=2),
-                fill='tozeroy'
-            ))
+            if len(failure_pct) > MAX_TREND_POINTS:
+                # Long series: draw a min/max band per bin with the bin mean on top,
+                # so the filled shape has a bounded number of vertices
+                starts, lows, highs, means = bin_envelope(failure_pct, MAX_TREND_POINTS // 2)
+                bin_dates = dates[starts]
+                
+                fig.add_trace(go.Scattergl(
+                    x=bin_dates,
+                    y=lows,
+                    mode='lines',
+                    line=dict(width=0),
+                    showlegend=False,
+                    hoverinfo='skip'
+                ))
+                
+                fig.add_trace(go.Scattergl(
+                    x=bin_dates,
+                    y=highs,
+                    mode='lines',
+                    name='Failure Rate Range',
+                    line=dict(width=0),
+                    fill='tonexty',
+                    fillcolor='rgba(239, 68, 68, 0.3)'
+                ))
+                
+                fig.add_trace(go.Scattergl(
+                    x=bin_dates,
+                    y=means,
+                    mode='lines',
+                    name='Failure Rate',
+                    line=dict(color='#EF4444', width=2)
+                ))
+            else:
+                fig.add_trace(go.Scatter(
+                    x=dates,
+                    y=failure_pct,
+                    mode='lines',
+                    name='Failure Rate',
+                    line=dict(color='#EF4444', width=2),
+                    fill='tozeroy'
+                ))
             
             # Add SLA threshold line
             fig.add_hline(
@@ -167,14 +218,15 @@ def display_trend_analysis(data):
                 xaxis_title='Date',
                 yaxis_title='Failure Rate (%)',
                 height=400,
-                hovermode='x unified'
+                hovermode='x unified',
+                uirevision='failure_trend'
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True, key='failure_trend_chart')
         
         with col2:
             # Current health gauge
-            current_health = (1 - network_metrics.iloc[-1]['FAILURE_RATE']) * 100
+            current_health = (1 - network_metrics['FAILURE_RATE'].to_numpy()[-1]) * 100
             
             health_gauge = create_gauge_chart(
                 value=current_health,
@@ -187,7 +239,7 @@ def display_trend_analysis(data):
                 ]
             )
             
-            st.plotly_chart(health_gauge, use_container_width=True)
+            st.plotly_chart(health_gauge, use_container_width=True, key='health_gauge_chart')
             
             # Statistics
             st.markdown("#### 30-Day Statistics")
@@ -201,19 +253,21 @@ def display_trend_analysis(data):
         fig = go.Figure()
         
         # Calculate rolling average
-        network_metrics['signal_ma'] = network_metrics['AVG_SIGNAL_STRENGTH'].rolling(window=7).mean()
+        signal = network_metrics['AVG_SIGNAL_STRENGTH'].to_numpy()
+        signal_ma = rolling_mean(signal, 7, min_periods=7)
+        shown = downsample_minmax(signal, MAX_TREND_POINTS)
         
-        fig.add_trace(go.Scatter(
-            x=network_metrics['DATE'],
-            y=network_metrics['AVG_SIGNAL_STRENGTH'],
+        fig.add_trace(go.Scattergl(
+            x=dates[shown],
+            y=signal[shown],
             mode='markers',
             name='Daily Signal',
             marker=dict(color='#3B82F6', size=4, opacity=0.5)
         ))
         
-        fig.add_trace(go.Scatter(
-            x=network_metrics['DATE'],
-            y=network_metrics['signal_ma'],
+        fig.add_trace(go.Scattergl(
+            x=dates[shown],
+            y=signal_ma[shown],
             mode='lines',
             name='7-Day Average',
             line=dict(color='#1E3A8A', width=3)
@@ -224,23 +278,25 @@ def display_trend_analysis(data):
             xaxis_title='Date',
             yaxis_title='Signal Strength (dBm)',
             height=400,
-            hovermode='x unified'
+            hovermode='x unified',
+            uirevision='signal_trend'
         )
         
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key='signal_trend_chart')
     
     with tab3:
         col1, col2 = st.columns(2)
         
         with col1:
             # Cumulative downtime
-            network_metrics['cumulative_downtime'] = network_metrics['DOWNTIME_HOURS'].cumsum()
+            cumulative_downtime = np.cumsum(network_metrics['DOWNTIME_HOURS'].to_numpy())
+            shown = downsample_minmax(cumulative_downtime, MAX_TREND_POINTS)
             
             fig = go.Figure()
             
-            fig.add_trace(go.Scatter(
-                x=network_metrics['DATE'],
-                y=network_metrics['cumulative_downtime'],
+            fig.add_trace(go.Scattergl(
+                x=dates[shown],
+                y=cumulative_downtime[shown],
                 mode='lines',
                 fill='tozeroy',
                 name='Cumulative Downtime',
@@ -251,21 +307,23 @@ def display_trend_analysis(data):
                 title='Cumulative Network Downtime',
                 xaxis_title='Date',
                 yaxis_title='Total Hours',
-                height=400
+                height=400,
+                uirevision='cumulative_downtime'
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True, key='cumulative_downtime_chart')
         
         with col2:
-            # Downtime by day of week
-            network_metrics['day_of_week'] = network_metrics['DATE'].dt.day_name()
-            dow_downtime = network_metrics.groupby('day_of_week')['DOWNTIME_HOURS'].mean().reindex([
-                'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'
-            ])
+            # Downtime by day of week, averaged from two histograms over weekday codes (Monday = 0)
+            weekday = network_metrics['DATE'].dt.weekday.to_numpy()
+            downtime_sums = np.bincount(weekday, weights=network_metrics['DOWNTIME_HOURS'].to_numpy(), minlength=7)
+            day_counts = np.bincount(weekday, minlength=7)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dow_downtime = downtime_sums / day_counts
             
             fig = go.Figure(go.Bar(
-                x=dow_downtime.index,
-                y=dow_downtime.values,
+                x=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                y=dow_downtime,
                 marker_color='#F59E0B'
             ))
             
@@ -273,10 +331,11 @@ def display_trend_analysis(data):
                 title='Average Downtime by Day of Week',
                 xaxis_title='Day',
                 yaxis_title='Avg Hours',
-                height=400
+                height=400,
+                uirevision='weekday_downtime'
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True, key='weekday_downtime_chart')
 
 def display_regional_performance(data):
     """Display regional performance comparison"""
@@ -298,8 +357,8 @@ def display_regional_performance(data):
             color_continuous_scale='RdYlGn_r'
         )
         
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        fig.update_layout(height=400, uirevision='regional_failure')
+        st.plotly_chart(fig, use_container_width=True, key='regional_failure_chart')
     
     with col2:
         # Customer satisfaction by region
@@ -313,15 +372,16 @@ def display_regional_performance(data):
             color_continuous_scale='RdYlGn'
         )
         
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        fig.update_layout(height=400, uirevision='regional_satisfaction')
+        st.plotly_chart(fig, use_container_width=True, key='regional_satisfaction_chart')
     
     # Regional comparison table
     st.markdown("#### Regional Metrics Summary")
     
-    display_regional = regional_data.copy()
-    display_regional['AVG_FAILURE_RATE'] = display_regional['AVG_FAILURE_RATE'].apply(lambda x: f"{x:.2%}")
-    display_regional['CUSTOMER_SATISFACTION'] = display_regional['CUSTOMER_SATISFACTION'].apply(lambda x: f"{x:.2f}/5.0")
+    display_regional = regional_data.assign(
+        AVG_FAILURE_RATE=regional_data['AVG_FAILURE_RATE'].map("{:.2%}".format),
+        CUSTOMER_SATISFACTION=regional_data['CUSTOMER_SATISFACTION'].map("{:.2f}/5.0".format)
+    )
     
     st.dataframe(
         display_regional,
@@ -361,9 +421,9 @@ def display_tower_status_distribution(data):
         )
         
         fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(height=400)
+        fig.update_layout(height=400, uirevision='status_distribution')
         
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key='status_distribution_chart')
     
     with col2:
         # Status table with counts
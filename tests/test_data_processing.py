@@ -0,0 +1,216 @@
+"""
+Regression tests pinning the NumPy helpers in utils.data_processing to the
+pandas / scipy computations they replace
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import pearsonr
+
+from utils.data_processing import (
+    bin_envelope,
+    calculate_correlation_matrix,
+    calculate_failure_severity,
+    calculate_failure_severity_vec,
+    downsample_minmax,
+    get_grid_cells,
+    grid_aggregate,
+    rolling_mean,
+    spatial_downsample,
+)
+
+
+def test_failure_severity_vec_matches_scalar():
+    rng = np.random.default_rng(0)
+    failure_rates = np.concatenate((rng.beta(2, 20, 500), [0.0, 0.05, 0.10, 0.15]))
+    ticket_counts = np.concatenate((rng.poisson(40, 500), [0, 0, 0, 0]))
+    
+    expected = [calculate_failure_severity(f, t) for f, t in zip(failure_rates, ticket_counts)]
+    
+    assert calculate_failure_severity_vec(failure_rates, ticket_counts).tolist() == expected
+
+
+def test_failure_severity_vec_broadcasts_scalar_tickets():
+    failure_rates = np.array([0.01, 0.08, 0.12, 0.2])
+    
+    expected = [calculate_failure_severity(f, 5) for f in failure_rates]
+    
+    assert calculate_failure_severity_vec(failure_rates, 5).tolist() == expected
+
+
+def make_tower_frame(n=500, seed=1):
+    rng = np.random.default_rng(seed)
+    failure_rate = rng.beta(2, 50, n)
+    ticket_count = (rng.poisson(15, n) + failure_rate * 100).astype(float)
+    sentiment = rng.beta(2, 2, n) * 3 + 1 - failure_rate * 10
+    return pd.DataFrame({
+        'FAILURE_RATE': failure_rate,
+        'TICKET_COUNT': ticket_count,
+        'AVG_SENTIMENT': sentiment
+    })
+
+
+def assert_matches_pairwise_pearsonr(df, cols):
+    corr, pvals = calculate_correlation_matrix(df, cols)
+    for i, col1 in enumerate(cols):
+        for j, col2 in enumerate(cols):
+            if i == j:
+                continue
+            pair = df[[col1, col2]].dropna()
+            expected_r, expected_p = pearsonr(pair[col1], pair[col2])
+            assert corr[i, j] == pytest.approx(expected_r, abs=1e-12)
+            assert pvals[i, j] == pytest.approx(expected_p, rel=1e-6, abs=1e-300)
+
+
+def test_correlation_matrix_matches_pearsonr():
+    df = make_tower_frame()
+    assert_matches_pairwise_pearsonr(df, ['FAILURE_RATE', 'TICKET_COUNT', 'AVG_SENTIMENT'])
+
+
+def test_correlation_matrix_drops_missing_values_per_pair():
+    # Towers without tickets have no sentiment; that must not shrink the
+    # failure rate / ticket count sample
+    df = make_tower_frame()
+    df.loc[:51, 'TICKET_COUNT'] = 0.0
+    df.loc[:51, 'AVG_SENTIMENT'] = np.nan
+    assert_matches_pairwise_pearsonr(df, ['FAILURE_RATE', 'TICKET_COUNT', 'AVG_SENTIMENT'])
+
+
+def test_correlation_matrix_needs_three_rows_per_pair():
+    df = make_tower_frame(n=4)
+    df.loc[:1, 'AVG_SENTIMENT'] = np.nan
+    
+    corr, pvals = calculate_correlation_matrix(df, ['FAILURE_RATE', 'TICKET_COUNT', 'AVG_SENTIMENT'])
+    
+    assert corr[0, 2] == 0.0 and pvals[0, 2] == 1.0
+    assert corr[1, 2] == 0.0 and pvals[1, 2] == 1.0
+    assert corr[0, 1] == pytest.approx(pearsonr(df['FAILURE_RATE'], df['TICKET_COUNT'])[0])
+
+
+@pytest.mark.parametrize('window, min_periods', [(1, 1), (7, 1), (7, 3), (30, 7), (200, 1)])
+def test_rolling_mean_matches_pandas(window, min_periods):
+    rng = np.random.default_rng(2)
+    values = rng.normal(50, 10, 120)
+    values[[0, 5, 6, 40, 41, 42, 43, 44, 45, 46, 47]] = np.nan
+    
+    expected = pd.Series(values).rolling(window, min_periods=min_periods).mean().to_numpy()
+    
+    np.testing.assert_allclose(rolling_mean(values, window, min_periods), expected, rtol=1e-10)
+
+
+def test_rolling_mean_smooths_2d_columns_independently():
+    rng = np.random.default_rng(3)
+    values = rng.normal(0, 1, (60, 3))
+    values[10:14, 1] = np.nan
+    
+    expected = pd.DataFrame(values).rolling(7, min_periods=1).mean().to_numpy()
+    
+    np.testing.assert_allclose(rolling_mean(values, 7), expected, rtol=1e-10, atol=1e-12)
+
+
+def test_downsample_minmax_keeps_each_bucket_extremes():
+    rng = np.random.default_rng(4)
+    values = rng.normal(0, 1, 10_001)
+    values[[17, 5000, 9999]] = [25.0, -25.0, np.nan]
+    max_points = 1000
+    
+    kept = downsample_minmax(values, max_points)
+    
+    # Same buckets as the helper: max_points // 2 of equal width
+    bucket = -(-len(values) // (max_points // 2))
+    groups = pd.Series(values).groupby(np.arange(len(values)) // bucket)
+    expected = np.union1d(groups.idxmin().to_numpy(), groups.idxmax().to_numpy())
+    
+    np.testing.assert_array_equal(kept, expected)
+    assert len(kept) <= max_points
+    assert {17, 5000} <= set(kept.tolist())
+
+
+def test_downsample_minmax_keeps_short_series():
+    np.testing.assert_array_equal(downsample_minmax(np.arange(10.0), 1000), np.arange(10))
+
+
+@pytest.mark.parametrize('n, n_bins', [(1000, 100), (1003, 97), (50, 200)])
+def test_bin_envelope_matches_pandas_groupby(n, n_bins):
+    rng = np.random.default_rng(5)
+    values = rng.normal(0, 1, n)
+    values[::17] = np.nan
+    
+    starts, lows, highs, means = bin_envelope(values, n_bins)
+    
+    bins = np.searchsorted(starts, np.arange(n), side='right') - 1
+    expected = pd.Series(values).groupby(bins).agg(['min', 'max', 'mean'])
+    
+    assert starts[0] == 0 and len(starts) == min(n, n_bins)
+    np.testing.assert_allclose(lows, expected['min'].to_numpy())
+    np.testing.assert_allclose(highs, expected['max'].to_numpy())
+    np.testing.assert_allclose(means, expected['mean'].to_numpy(), rtol=1e-10)
+
+
+def make_clustered_points(n=20_000, seed=6):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([37.5, -122.6], [38.0, -122.0], (8, 2))
+    points = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.02, (n, 2))
+    return pd.DataFrame({
+        'LATITUDE': points[:, 0],
+        'LONGITUDE': points[:, 1],
+        'FAILURE_RATE': rng.beta(2, 50, n)
+    })
+
+
+def test_spatial_downsample_keeps_top_ranked_point_per_cell():
+    df = make_clustered_points()
+    df.loc[[3, 30], 'LATITUDE'] = np.nan
+    df.loc[[7, 70], 'FAILURE_RATE'] = np.nan
+    max_points = 5000
+    
+    kept = spatial_downsample(df, max_points, rank_col='FAILURE_RATE')
+    
+    located = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    cells = get_grid_cells(
+        located['LATITUDE'].to_numpy(), located['LONGITUDE'].to_numpy(), int(np.sqrt(max_points))
+    )
+    expected = located.assign(cell=cells).sort_values(
+        'FAILURE_RATE', ascending=False, kind='stable'
+    ).groupby('cell').head(1).index.sort_values()
+    
+    assert kept.index.equals(expected)
+    assert len(kept) <= max_points
+
+
+def test_spatial_downsample_without_rank_keeps_first_row_per_cell():
+    df = make_clustered_points()
+    
+    kept = spatial_downsample(df, 5000)
+    
+    cells = get_grid_cells(df['LATITUDE'].to_numpy(), df['LONGITUDE'].to_numpy(), int(np.sqrt(5000)))
+    expected = df.assign(cell=cells).groupby('cell').head(1).index
+    
+    assert kept.index.equals(expected)
+
+
+def test_spatial_downsample_returns_small_frames_unchanged():
+    df = make_clustered_points(n=100)
+    assert spatial_downsample(df, 5000) is df
+
+
+def test_grid_aggregate_matches_pandas_groupby():
+    df = make_clustered_points()
+    df.loc[[11, 12], 'LONGITUDE'] = np.nan
+    df.loc[[20, 21], 'FAILURE_RATE'] = np.nan
+    
+    lats, lons, weights = grid_aggregate(
+        df['LATITUDE'], df['LONGITUDE'], df['FAILURE_RATE'], 100
+    )
+    
+    located = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    cells = get_grid_cells(located['LATITUDE'].to_numpy(), located['LONGITUDE'].to_numpy(), 100)
+    expected = located.groupby(cells).agg(
+        lat=('LATITUDE', 'mean'), lon=('LONGITUDE', 'mean'), weight=('FAILURE_RATE', 'sum')
+    )
+    
+    np.testing.assert_allclose(lats, expected['lat'].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(lons, expected['lon'].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(weights, expected['weight'].to_numpy(), rtol=1e-10)
+    assert weights.sum() == pytest.approx(df['FAILURE_RATE'].where(df['LONGITUDE'].notna()).sum())
@@ -4,9 +4,17 @@ Data processing utilities for network analytics
 
 import pandas as pd
 import numpy as np
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional, Union
 import h3
 
+# h3 v4 renamed geo_to_h3 to latlng_to_cell (same arguments); resolve whichever
+# the installed version provides once, since requirements.txt does not pin it
+latlng_to_cell = getattr(h3, 'latlng_to_cell', None) or h3.geo_to_h3
+
+# Severity score cut-offs, checked from most to least severe; anything at or
+# below the last one is "Low"
+SEVERITY_THRESHOLDS = [(15, 'Critical'), (10, 'High'), (5, 'Medium')]
+
 def calculate_failure_severity(failure_rate: float, ticket_count: int) -> str:
     """
     Calculate combined severity based on failure rate and support tickets
@@ -20,14 +28,30 @@ def calculate_failure_severity(failure_rate: float, ticket_count: int) -> str:
     """
     severity_score = (failure_rate * 100) + (ticket_count / 10)
     
-    if severity_score > 15:
-        return "Critical"
-    elif severity_score > 10:
-        return "High"
-    elif severity_score > 5:
-        return "Medium"
-    else:
-        return "Low"
+    for threshold, severity in SEVERITY_THRESHOLDS:
+        if severity_score > threshold:
+            return severity
+    return "Low"
+
+def calculate_failure_severity_vec(failure_rates: np.ndarray,
+                                   ticket_counts: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calculate_failure_severity over whole columns
+    
+    Args:
+        failure_rates: Array of cell tower failure rates (0-1)
+        ticket_counts: Array (or scalar) of support ticket counts
+    
+    Returns:
+        np.ndarray: Severity level per tower (Critical, High, Medium, Low)
+    """
+    severity_score = (np.asarray(failure_rates) * 100) + (np.asarray(ticket_counts) / 10)
+    
+    return np.select(
+        [severity_score > threshold for threshold, _ in SEVERITY_THRESHOLDS],
+        [severity for _, severity in SEVERITY_THRESHOLDS],
+        default='Low'
+    )
 
 def get_h3_hexagons(lat: float, lon: float, resolution: int = 7) -> List[str]:
     """
@@ -42,11 +66,29 @@ def get_h3_hexagons(lat: float, lon: float, resolution: int = 7) -> List[str]:
         List of H3 hexagon IDs
     """
     try:
-        hex_id = h3.geo_to_h3(lat, lon, resolution)
-        return [hex_id]
+        return get_h3_cells([lat], [lon], resolution).tolist()
     except Exception:
         return []
 
+def get_h3_cells(lats: np.ndarray, lons: np.ndarray, resolution: int = 7) -> np.ndarray:
+    """
+    Get the H3 hexagon for every coordinate pair in one batch
+    
+    Args:
+        lats: Latitudes
+        lons: Longitudes
+        resolution: H3 resolution level (default 7)
+    
+    Returns:
+        np.ndarray: H3 hexagon ID per coordinate pair
+    """
+    # h3 takes one point per call; iterate plain floats and a bound function
+    # so the loop does no NumPy scalar boxing or attribute lookups
+    to_cell = latlng_to_cell
+    lats = np.asarray(lats, dtype=np.float64).tolist()
+    lons = np.asarray(lons, dtype=np.float64).tolist()
+    return np.array([to_cell(lat, lon, resolution) for lat, lon in zip(lats, lons)], dtype=object)
+
 def aggregate_metrics_by_region(df: pd.DataFrame, lat_col: str = 'LATITUDE', 
                                 lon_col: str = 'LONGITUDE') -> pd.DataFrame:
     """
@@ -61,14 +103,11 @@ def aggregate_metrics_by_region(df: pd.DataFrame, lat_col: str = 'LATITUDE',
         pd.DataFrame: Aggregated metrics by region
     """
     try:
-        # Add H3 hexagon IDs
-        df['h3_hex'] = df.apply(
-            lambda row: h3.geo_to_h3(row[lat_col], row[lon_col], 7), 
-            axis=1
-        )
+        # Add H3 hexagon IDs from the raw coordinate arrays
+        hexed = df.assign(h3_hex=get_h3_cells(df[lat_col].to_numpy(), df[lon_col].to_numpy(), 7))
         
         # Aggregate by hexagon
-        aggregated = df.groupby('h3_hex').agg({
+        aggregated = hexed.groupby('h3_hex', sort=False).agg({
             'FAILURE_RATE': 'mean',
             'CELL_TOWER_ID': 'count',
             lat_col: 'mean',
@@ -82,7 +121,32 @@ def aggregate_metrics_by_region(df: pd.DataFrame, lat_col: str = 'LATITUDE',
         print(f"Error in region aggregation: {str(e)}")
         return pd.DataFrame()
 
-def calculate_correlation(df: pd.DataFrame, col1: str, col2: str) -> Tuple[float, float]:
+def build_region_stats(table):
+    """
+    Build the per-region tower summary as a query to run inside Snowflake
+    
+    Args:
+        table: Snowpark DataFrame with REGION, FAILURE_RATE, TICKET_COUNT,
+            AVG_SENTIMENT and CELL_TOWER_ID columns
+    
+    Returns:
+        snowflake.snowpark.DataFrame: Lazy query with one row per region,
+        sorted by region; the statistics match the pandas groupby (std is the
+        sample standard deviation and missing values are skipped)
+    """
+    from snowflake.snowpark.functions import avg, col, count, stddev, sum as sum_
+    
+    return table.group_by('REGION').agg(
+        avg(col('FAILURE_RATE')).alias('AVG_FAILURE_RATE'),
+        stddev(col('FAILURE_RATE')).alias('STD_FAILURE_RATE'),
+        sum_(col('TICKET_COUNT')).alias('TOTAL_TICKETS'),
+        avg(col('TICKET_COUNT')).alias('AVG_TICKETS'),
+        avg(col('AVG_SENTIMENT')).alias('AVG_SENTIMENT'),
+        count(col('CELL_TOWER_ID')).alias('TOWER_COUNT')
+    ).sort('REGION')
+
+def calculate_correlation(df: pd.DataFrame, col1: str, col2: str,
+                          with_pvalue: bool = True) -> Union[Tuple[float, float], float]:
     """
     Calculate Pearson correlation and p-value between two columns
     
@@ -90,21 +154,71 @@ def calculate_correlation(df: pd.DataFrame, col1: str, col2: str) -> Tuple[float
         df: DataFrame containing the data
         col1: First column name
         col2: Second column name
+        with_pvalue: Also compute the p-value; when False only the
+            coefficient is returned, straight from np.corrcoef
     
     Returns:
-        Tuple of (correlation coefficient, p-value)
+        Tuple of (correlation coefficient, p-value), or just the coefficient
     """
-    from scipy.stats import pearsonr
-    
     try:
         clean_df = df[[col1, col2]].dropna()
         if len(clean_df) < 2:
-            return (0.0, 1.0)
+            return (0.0, 1.0) if with_pvalue else 0.0
+        
+        if not with_pvalue:
+            return float(np.corrcoef(clean_df[col1].to_numpy(), clean_df[col2].to_numpy())[0, 1])
+        
+        from scipy.stats import pearsonr
         
         corr, pval = pearsonr(clean_df[col1], clean_df[col2])
         return (corr, pval)
     except Exception:
-        return (0.0, 1.0)
+        return (0.0, 1.0) if with_pvalue else 0.0
+
+def calculate_correlation_matrix(df: pd.DataFrame, cols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate Pearson correlations and p-values for several columns at once
+    
+    Missing values are dropped per pair of columns, as calculate_correlation
+    does, and the p-values come from the t-distribution of r rather than a
+    pass per pair. Pairs with fewer than three complete rows get r=0, p=1.
+    
+    Args:
+        df: DataFrame containing the data
+        cols: Column names, in matrix order
+    
+    Returns:
+        Tuple of (correlation matrix, p-value matrix)
+    """
+    from scipy.stats import t as t_dist
+    
+    n_cols = len(cols)
+    values = df[cols].to_numpy(dtype=np.float64)
+    finite = np.isfinite(values)
+    
+    if finite.all():
+        # Every pair shares the same rows, so one corrcoef covers them all
+        counts = np.full((n_cols, n_cols), len(values))
+        corr = np.corrcoef(values, rowvar=False) if len(values) >= 3 else np.zeros((n_cols, n_cols))
+    else:
+        counts = finite.T.astype(np.int64) @ finite
+        corr = np.eye(n_cols)
+        for i in range(n_cols):
+            for j in range(i + 1, n_cols):
+                if counts[i, j] >= 3:
+                    rows = finite[:, i] & finite[:, j]
+                    corr[i, j] = corr[j, i] = np.corrcoef(values[rows, i], values[rows, j])[0, 1]
+    
+    dof = counts - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = corr * np.sqrt(dof / (1.0 - corr ** 2))
+        pvals = 2 * t_dist.sf(np.abs(t_stat), dof)
+    
+    too_few = counts < 3
+    corr[too_few] = 0.0
+    pvals[too_few] = 1.0
+    
+    return (corr, pvals)
 
 def get_top_performing_towers(df: pd.DataFrame, metric: str = 'FAILURE_RATE', 
                              top_n: int = 10, ascending: bool = True) -> pd.DataFrame:
@@ -120,7 +234,51 @@ def get_top_performing_towers(df: pd.DataFrame, metric: str = 'FAILURE_RATE',
     Returns:
         pd.DataFrame: Top N towers
     """
-    return df.nsmallest(top_n, metric) if ascending else df.nlargest(top_n, metric)
+    # For a large share of the rows a full sort is just as cheap
+    if top_n <= 0 or top_n > len(df) // 4:
+        return df.nsmallest(top_n, metric) if ascending else df.nlargest(top_n, metric)
+    
+    # Partial selection over the non-missing values, then sort only the top N
+    values = df[metric].to_numpy(dtype=np.float64)
+    if not ascending:
+        values = -values
+    candidates = np.flatnonzero(~np.isnan(values))
+    top_n = min(top_n, len(candidates))
+    if top_n == 0:
+        return df.iloc[:0]
+    
+    top_idx = candidates[np.argpartition(values[candidates], top_n - 1)[:top_n]]
+    top_idx = top_idx[np.argsort(values[top_idx], kind='stable')]
+    return df.iloc[top_idx]
+
+def rolling_mean(values: np.ndarray, window: int = 7, min_periods: int = 1) -> np.ndarray:
+    """
+    Trailing moving average over a raw NumPy array
+    
+    Uses running sums instead of pandas' rolling machinery; missing values are
+    skipped and do not count towards min_periods, as with Series.rolling.
+    
+    Args:
+        values: Data values; a 2-D array is smoothed column by column
+        window: Window size for moving average
+        min_periods: Minimum number of observations needed for a value
+    
+    Returns:
+        np.ndarray: Smoothed values, NaN where the window has too few observations
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    leading_zeros = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate((leading_zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)))
+    counts = np.concatenate((leading_zeros, np.cumsum(valid, axis=0)))
+    
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    window_sums = sums[end] - sums[start]
+    window_counts = counts[end] - counts[start]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(window_counts >= max(min_periods, 1), window_sums / window_counts, np.nan)
 
 def calculate_moving_average(series: pd.Series, window: int = 7) -> pd.Series:
     """
@@ -133,21 +291,223 @@ def calculate_moving_average(series: pd.Series, window: int = 7) -> pd.Series:
     Returns:
         pd.Series: Smoothed series
     """
-    return series.rolling(window=window, min_periods=1).mean()
+    return pd.Series(rolling_mean(series.to_numpy(), window), index=series.index, name=series.name)
+
+def downsample_minmax(values: np.ndarray, max_points: int = 1000) -> np.ndarray:
+    """
+    Pick the positions to plot so a long series keeps its visual envelope
+    
+    The series is split into max_points / 2 equal buckets and the minimum and
+    maximum of each bucket are kept, so spikes survive the downsampling.
+    
+    Args:
+        values: Data values, in plotting order
+        max_points: Upper bound on the number of positions returned
+    
+    Returns:
+        np.ndarray: Sorted row positions to keep (all of them for short series)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    
+    bucket = -(-n // max(max_points // 2, 1))
+    n_buckets = -(-n // bucket)
+    padded = np.full(n_buckets * bucket, np.nan)
+    padded[:n] = values
+    rows = padded.reshape(n_buckets, bucket)
+    missing = np.isnan(rows)
+    
+    offsets = np.arange(n_buckets) * bucket
+    lows = np.where(missing, np.inf, rows).argmin(axis=1) + offsets
+    highs = np.where(missing, -np.inf, rows).argmax(axis=1) + offsets
+    return np.unique(np.concatenate((lows, highs)))
+
+def normalize_weights(values: np.ndarray) -> np.ndarray:
+    """
+    Scale weights into the 0-1 range by their maximum
+    
+    Args:
+        values: Weight values (missing values stay missing)
+    
+    Returns:
+        np.ndarray: Scaled weights; all zeros if no weight is positive
+    """
+    values = np.asarray(values, dtype=np.float64)
+    max_weight = np.fmax.reduce(values, initial=0.0)
+    return np.divide(values, max_weight, out=np.zeros_like(values), where=max_weight > 0)
+
+def get_grid_cells(lats: np.ndarray, lons: np.ndarray, cells: int) -> np.ndarray:
+    """
+    Assign points to a cells x cells grid laid over their bounding box
+    
+    Args:
+        lats: Latitudes (no missing values)
+        lons: Longitudes (no missing values)
+        cells: Grid cells per side
+    
+    Returns:
+        np.ndarray: Flat grid cell ID per point
+    """
+    if len(lats) == 0:
+        return np.zeros(0, dtype=np.int64)
+    
+    lat_span = max(lats.max() - lats.min(), 1e-9)
+    lon_span = max(lons.max() - lons.min(), 1e-9)
+    row = np.minimum(((lats - lats.min()) / lat_span * cells).astype(np.int64), cells - 1)
+    col = np.minimum(((lons - lons.min()) / lon_span * cells).astype(np.int64), cells - 1)
+    return row * cells + col
+
+def grid_aggregate(lats: np.ndarray, lons: np.ndarray, weights: np.ndarray,
+                   cells: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sum point weights onto a grid so a map gets one point per occupied cell
+    
+    Args:
+        lats: Latitudes
+        lons: Longitudes
+        weights: Weight per point (missing weights count as 0)
+        cells: Grid cells per side
+    
+    Returns:
+        Tuple of (centroid latitude, centroid longitude, total weight) per cell
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    located = np.isfinite(lats) & np.isfinite(lons)
+    lats, lons = lats[located], lons[located]
+    weights = np.nan_to_num(np.asarray(weights, dtype=np.float64)[located])
+    
+    _, cell_index = np.unique(get_grid_cells(lats, lons, cells), return_inverse=True)
+    counts = np.bincount(cell_index)
+    
+    return (
+        np.bincount(cell_index, weights=lats) / counts,
+        np.bincount(cell_index, weights=lons) / counts,
+        np.bincount(cell_index, weights=weights)
+    )
+
+def get_view_center(lats: np.ndarray, lons: np.ndarray,
+                    max_samples: int = 10000) -> Tuple[float, float]:
+    """
+    Approximate the centroid of a set of points for centering a map view
+    
+    Args:
+        lats: Latitudes
+        lons: Longitudes
+        max_samples: Most points to average; longer inputs are read at an even stride
+    
+    Returns:
+        Tuple of (latitude, longitude)
+    """
+    step = max(1, len(lats) // max_samples)
+    return float(np.nanmean(lats[::step])), float(np.nanmean(lons[::step]))
+
+def spatial_downsample(df: pd.DataFrame, max_points: int, lat_col: str = 'LATITUDE',
+                       lon_col: str = 'LONGITUDE', rank_col: Optional[str] = None) -> pd.DataFrame:
+    """
+    Thin out a point set for map display, one point per grid cell
+    
+    The bounding box is split into a grid of at most max_points cells and the
+    highest-ranked point in each occupied cell is kept, so dense clusters are
+    thinned while isolated points and outliers stay visible.
+    
+    Args:
+        df: DataFrame with location data
+        max_points: Upper bound on the number of rows returned
+        lat_col: Latitude column name
+        lon_col: Longitude column name
+        rank_col: Column to prefer high values of within a cell (first row if None)
+    
+    Returns:
+        pd.DataFrame: The input unchanged if small enough, else the kept rows
+    """
+    if len(df) <= max_points:
+        return df
+    
+    lats = df[lat_col].to_numpy(dtype=np.float64)
+    lons = df[lon_col].to_numpy(dtype=np.float64)
+    located = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+    
+    # Square grid over the bounding box with at most max_points cells
+    bucket = get_grid_cells(lats[located], lons[located], max(int(np.sqrt(max_points)), 1))
+    
+    # Visit rows best-first so np.unique's first hit per cell is the one kept
+    if rank_col is not None:
+        rank = df[rank_col].to_numpy(dtype=np.float64)[located]
+        order = np.argsort(-np.nan_to_num(rank, nan=-np.inf), kind='stable')
+    else:
+        order = np.arange(len(located))
+    _, first = np.unique(bucket[order], return_index=True)
+    
+    return df.iloc[np.sort(located[order[first]])]
+
+def bin_envelope(values: np.ndarray, n_bins: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Aggregate a long series into equal-width bins for band-style plotting
+    
+    Args:
+        values: Data values, in plotting order
+        n_bins: Number of bins (capped at the series length)
+    
+    Returns:
+        Tuple of (bin start positions, minimum, maximum, mean) per bin;
+        missing values are skipped
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    starts = np.unique(np.linspace(0, n, min(n_bins, n) + 1).astype(np.intp)[:-1])
+    
+    valid = ~np.isnan(values)
+    lows = np.fmin.reduceat(values, starts)
+    highs = np.fmax.reduceat(values, starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.add.reduceat(np.where(valid, values, 0.0), starts) / np.add.reduceat(valid, starts)
+    
+    return (starts, lows, highs, means)
 
-def detect_anomalies(series: pd.Series, threshold: float = 3.0) -> pd.Series:
+def calculate_z_scores(values: np.ndarray) -> np.ndarray:
+    """
+    Calculate z-scores over a raw NumPy array
+    
+    Args:
+        values: Data values
+    
+    Returns:
+        np.ndarray: Z-score per value (sample standard deviation, like pandas)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return (values - np.nanmean(values)) / np.nanstd(values, ddof=1)
+
+def detect_anomalies(series: pd.Series, threshold: float = 3.0,
+                     window: Optional[int] = None) -> pd.Series:
     """
     Detect anomalies using z-score method
     
     Args:
         series: Data series
         threshold: Z-score threshold for anomaly detection
+        window: If set, score each value against the mean and sample standard
+            deviation of the trailing window instead of the whole series
     
     Returns:
         pd.Series: Boolean series indicating anomalies
     """
-    z_scores = np.abs((series - series.mean()) / series.std())
-    return z_scores > threshold
+    values = series.to_numpy(dtype=np.float64)
+    
+    if window is None:
+        z_scores = calculate_z_scores(values)
+    else:
+        # pandas' rolling moments are updated stably (no E[x^2] - E[x]^2
+        # cancellation) and std uses ddof=1, like calculate_z_scores
+        rolling = pd.Series(values).rolling(window, min_periods=1)
+        local_mean = rolling.mean().to_numpy()
+        local_std = rolling.std().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = (values - local_mean) / local_std
+    
+    return pd.Series(np.abs(z_scores) > threshold, index=series.index)
 
 def prepare_heatmap_data(df: pd.DataFrame, metric: str, 
                         lat_col: str = 'LATITUDE', 
@@ -170,6 +530,15 @@ def prepare_heatmap_data(df: pd.DataFrame, metric: str,
     
     return heatmap_df
 
+# Display colour per severity level, and for anything unrecognised
+SEVERITY_COLORS = {
+    'Critical': '#DC2626',  # Red
+    'High': '#F59E0B',      # Orange
+    'Medium': '#FCD34D',    # Yellow
+    'Low': '#10B981'        # Green
+}
+DEFAULT_SEVERITY_COLOR = '#6B7280'
+
 def get_severity_color(severity: str) -> str:
     """
     Get color code for severity level
@@ -180,11 +549,19 @@ def get_severity_color(severity: str) -> str:
     Returns:
         str: Hex color code
     """
-    color_map = {
-        'Critical': '#DC2626',  # Red
-        'High': '#F59E0B',      # Orange
-        'Medium': '#FCD34D',    # Yellow
-        'Low': '#10B981'        # Green
-    }
-    return color_map.get(severity, '#6B7280')
+    return SEVERITY_COLORS.get(severity, DEFAULT_SEVERITY_COLOR)
 
+def get_severity_color_vec(severities: pd.Series) -> np.ndarray:
+    """
+    Vectorized get_severity_color over a whole column
+    
+    Args:
+        severities: Severity level per row (plain strings or categorical)
+    
+    Returns:
+        np.ndarray: Hex color code per row
+    """
+    # Unknown levels get position -1, which picks the trailing default colour
+    palette = np.array(list(SEVERITY_COLORS.values()) + [DEFAULT_SEVERITY_COLOR])
+    codes = pd.Index(list(SEVERITY_COLORS)).get_indexer(severities)
+    return palette[codes]
@@ -6,57 +6,90 @@ import streamlit as st
 from snowflake.snowpark import Session
 from snowflake.snowpark.context import get_active_session
 
-def get_snowflake_connection():
+def is_session_open(session):
     """
-    Get Snowflake connection session
+    Check that a cached session can still be used
+    
+    Args:
+        session (Session): Previously created Snowflake session
+    
+    Returns:
+        bool: False if the underlying connection has been closed
+    """
+    try:
+        return not session.connection.is_closed()
+    except Exception:
+        return False
+
+@st.cache_resource(show_spinner=False, validate=is_session_open)
+def create_snowflake_session():
+    """
+    Create the Snowflake session once and share it across reruns and pages
+    
+    Raises instead of returning None so that a failed attempt is not cached
+    and the next rerun retries the connection.
     
     Returns:
         Session: Active Snowflake session
     """
     try:
         # Try to get the active session (for Streamlit in Snowflake)
-        session = get_active_session()
-        return session
+        return get_active_session()
     except Exception:
         # Fallback for local development with connection parameters
-        try:
-            connection_parameters = {
-                "account": st.secrets.get("snowflake_account", ""),
-                "user": st.secrets.get("snowflake_user", ""),
-                "password": st.secrets.get("snowflake_password", ""),
-                "role": st.secrets.get("snowflake_role", ""),
-                "warehouse": st.secrets.get("snowflake_warehouse", ""),
-                "database": st.secrets.get("snowflake_database", "TELCO_NETWORK_OPTIMIZATION_PROD"),
-                "schema": st.secrets.get("snowflake_schema", "RAW")
-            }
-            
-            # Filter out empty values
-            connection_parameters = {k: v for k, v in connection_parameters.items() if v}
-            
-            if len(connection_parameters) > 0:
-                session = Session.builder.configs(connection_parameters).create()
-                return session
-            else:
-                st.error("No Snowflake connection available. Please configure connection parameters.")
-                return None
-        except Exception as e:
-            st.error(f"Failed to establish Snowflake connection: {str(e)}")
-            return None
+        connection_parameters = {
+            "account": st.secrets.get("snowflake_account", ""),
+            "user": st.secrets.get("snowflake_user", ""),
+            "password": st.secrets.get("snowflake_password", ""),
+            "role": st.secrets.get("snowflake_role", ""),
+            "warehouse": st.secrets.get("snowflake_warehouse", ""),
+            "database": st.secrets.get("snowflake_database", "TELCO_NETWORK_OPTIMIZATION_PROD"),
+            "schema": st.secrets.get("snowflake_schema", "RAW")
+        }
+        
+        # Filter out empty values
+        connection_parameters = {k: v for k, v in connection_parameters.items() if v}
+        
+        if not connection_parameters:
+            raise RuntimeError("No Snowflake connection available. Please configure connection parameters.")
+        
+        return Session.builder.configs(connection_parameters).create()
 
-def execute_query(query, params=None):
+def get_snowflake_connection():
+    """
+    Get Snowflake connection session
+    
+    Returns:
+        Session: Active Snowflake session, or None if no connection could be made
+    """
+    try:
+        return create_snowflake_session()
+    except Exception as e:
+        st.error(f"Failed to establish Snowflake connection: {str(e)}")
+        return None
+
+def execute_query(query, params=None, as_arrow=False):
     """
     Execute a SQL query and return results as pandas DataFrame
     
     Args:
         query (str): SQL query to execute
-        params (dict): Optional query parameters
+        params (list): Optional values bound to the query's placeholders
+            (? by default, %s when as_arrow is set)
+        as_arrow (bool): Return the connector's Arrow table instead, so callers
+            can pick columns and convert to pandas themselves
     
     Returns:
-        pd.DataFrame: Query results
+        pd.DataFrame: Query results (pyarrow.Table when as_arrow is set)
     """
     try:
         session = get_snowflake_connection()
         if session:
+            if as_arrow:
+                # The connector cursor binds client-side in pyformat, so
+                # placeholders here are %s rather than Snowpark's ?
+                with session.connection.cursor() as cur:
+                    return cur.execute(query, params).fetch_arrow_all()
             if params:
                 result = session.sql(query, params).to_pandas()
             else:
@@ -67,6 +100,26 @@ def execute_query(query, params=None):
         st.error(f"Query execution failed: {str(e)}")
         return None
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_database_context():
+    """
+    Fetch the current database context in a single round-trip
+    
+    Raises on failure so that an unavailable connection is not cached.
+    
+    Returns:
+        dict: Database, schema, warehouse and role names
+    """
+    row = create_snowflake_session().sql(
+        "SELECT CURRENT_DATABASE(), CURRENT_SCHEMA(), CURRENT_WAREHOUSE(), CURRENT_ROLE()"
+    ).collect()[0]
+    return {
+        'database': row[0],
+        'schema': row[1],
+        'warehouse': row[2],
+        'role': row[3]
+    }
+
 def get_database_context():
     """
     Get current database context information
@@ -75,17 +128,7 @@ def get_database_context():
         dict: Database, schema, and warehouse information
     """
     try:
-        session = get_snowflake_connection()
-        if session:
-            context = {
-                'database': session.get_current_database(),
-                'schema': session.get_current_schema(),
-                'warehouse': session.get_current_warehouse(),
-                'role': session.get_current_role()
-            }
-            return context
-        return {}
+        return fetch_database_context()
     except Exception as e:
         st.warning(f"Could not fetch database context: {str(e)}")
         return {}
-
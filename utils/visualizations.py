@@ -2,16 +2,123 @@
 Visualization utilities for network analytics
 """
 
-import plotly.express as px
+import threading
+import importlib
+import importlib.util
+import streamlit as st
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
+import numpy as np
 import pydeck as pdk
-from typing import Optional, List
+from functools import lru_cache
+from typing import Optional, List, Tuple
+from utils.data_processing import (
+    spatial_downsample, downsample_minmax, grid_aggregate, rolling_mean, normalize_weights,
+    get_view_center
+)
 
+# Serialize figures with orjson, which encodes NumPy arrays natively; pinning
+# the engine makes a broken orjson install fail loudly instead of silently
+# falling back to the slower json encoder
+if importlib.util.find_spec('orjson') is not None:
+    pio.json.config.default_engine = 'orjson'
+
+def preload_plotly_express():
+    """
+    Start importing plotly.express in a background thread
+    
+    The chart builders import plotly.express lazily, and it is the slowest
+    module they need. Pages call this before their data queries so the import
+    overlaps with the Snowflake round-trip rather than following it; a builder
+    that runs first simply waits on Python's import lock.
+    """
+    threading.Thread(target=importlib.import_module, args=('plotly.express',), daemon=True).start()
+
+@lru_cache(maxsize=256)
+def format_column_label(col: str) -> str:
+    """
+    Turn a column name such as FAILURE_RATE into an axis label (Failure Rate)
+    
+    Args:
+        col: Column name
+    
+    Returns:
+        str: Human-readable label
+    """
+    return col.replace('_', ' ').title()
+
+def fit_trendline(x, y) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Fit an ordinary least-squares line through a set of points
+    
+    Args:
+        x: X values
+        y: Y values
+    
+    Returns:
+        Tuple of (x, y) arrays for the line's two end points, or None when
+        there are too few distinct x values to fit
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    located = np.isfinite(x) & np.isfinite(y)
+    x, y = x[located], y[located]
+    if len(x) < 2 or np.ptp(x) == 0:
+        return None
+    
+    slope, intercept = np.polyfit(x, y, 1)
+    ends = np.array([x.min(), x.max()])
+    return (ends, slope * ends + intercept)
+
+# The Plotly builders below are cached on their arguments (DataFrames are
+# hashed by content), so reruns with unchanged data skip building and
+# validating the figure; each caller gets its own copy to modify
+
+# Above this many markers, maps drop hover entirely: picking gets slow and the
+# hover columns would be shipped for every point
+MAX_HOVER_POINTS = 10000
+
+# Above this many points, scatter plots are rasterized into a density image
+RASTERIZE_MIN_POINTS = 50000
+
+# ColorBrewer YlOrRd ramp for density layers, passed explicitly so deck.gl
+# builds its color texture from it instead of allocating the default gradient
+HEATMAP_COLOR_RANGE = [
+    [255, 255, 178],
+    [254, 204, 92],
+    [253, 141, 60],
+    [240, 59, 32],
+    [189, 0, 38]
+]
+
+# Gauge bands used when a caller gives none
+DEFAULT_GAUGE_STEPS = (
+    {'range': [0, 33], 'color': "lightgreen"},
+    {'range': [33, 66], 'color': "yellow"},
+    {'range': [66, 100], 'color': "red"}
+)
+
+# Gauge skeleton with the parts every gauge shares, validated once at import;
+# create_gauge_chart copies it and fills in the per-metric values
+GAUGE_PROTOTYPE = go.Figure(go.Indicator(
+    mode="gauge+number+delta",
+    gauge={
+        'bar': {'color': "darkblue"},
+        'steps': DEFAULT_GAUGE_STEPS,
+        'threshold': {
+            'line': {'color': "red", 'width': 4},
+            'thickness': 0.75
+        }
+    }
+))
+GAUGE_PROTOTYPE.update_layout(height=300)
+
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_scatter_map(df: pd.DataFrame, lat_col: str = 'LATITUDE', 
                       lon_col: str = 'LONGITUDE', color_col: str = 'FAILURE_RATE',
                       size_col: Optional[str] = None, hover_data: Optional[List[str]] = None,
-                      title: str = "Cell Tower Map") -> go.Figure:
+                      title: str = "Cell Tower Map", max_points: int = 5000) -> go.Figure:
     """
     Create interactive scatter map using Plotly
     
@@ -23,25 +130,59 @@ def create_scatter_map(df: pd.DataFrame, lat_col: str = 'LATITUDE',
         size_col: Column to size markers by
         hover_data: Additional columns to show on hover
         title: Map title
+        max_points: Upper bound on the markers drawn; larger inputs are thinned
+            to one marker per occupied map grid cell (keeping the highest
+            numeric color_col value), so clustered data can end up with far
+            fewer markers than this
     
     Returns:
         go.Figure: Plotly figure object
     """
-    fig = px.scatter_mapbox(
-        df,
+    import plotly.express as px
+    
+    # Grid thinning keeps at most one marker per occupied cell, so max_points is
+    # an upper bound rather than a target; only a numeric color can rank them
+    rank_col = color_col if color_col in df.columns and pd.api.types.is_numeric_dtype(df[color_col]) else None
+    df = spatial_downsample(df, max_points, lat_col, lon_col, rank_col=rank_col)
+    show_hover = len(df) <= MAX_HOVER_POINTS
+    
+    # float32 still resolves ~1 m and halves the coordinate arrays Plotly ships
+    df = df.assign(**{
+        col: df[col].astype(np.float32)
+        for col in (lat_col, lon_col) if df[col].dtype == np.float64
+    })
+    
+    # Hover columns travel as customdata behind one shared template; give
+    # float columns a fixed format instead of their full-precision repr
+    if hover_data and show_hover:
+        hover_data = {
+            col: ':.2f' if pd.api.types.is_float_dtype(df[col]) else True
+            for col in hover_data
+        }
+    
+    map_args = dict(
         lat=lat_col,
         lon=lon_col,
         color=color_col,
         size=size_col if size_col else None,
-        hover_data=hover_data,
+        hover_data=hover_data if show_hover else None,
         title=title,
         zoom=10,
         height=600,
         color_continuous_scale="RdYlGn_r"
     )
     
+    # Prefer the MapLibre-based scatter_map (plotly >= 5.24), which replaces
+    # the deprecated Mapbox trace; older plotly releases only have the latter
+    if hasattr(px, 'scatter_map'):
+        fig = px.scatter_map(df, map_style="open-street-map", **map_args)
+    else:
+        fig = px.scatter_mapbox(df, mapbox_style="open-street-map", **map_args)
+    
+    if not show_hover:
+        fig.update_traces(hoverinfo='skip', hovertemplate=None)
+    
     fig.update_layout(
-        mapbox_style="open-street-map",
         margin={"r": 0, "t": 40, "l": 0, "b": 0}
     )
     
@@ -49,7 +190,7 @@ def create_scatter_map(df: pd.DataFrame, lat_col: str = 'LATITUDE',
 
 def create_heatmap_layer(df: pd.DataFrame, lat_col: str = 'LATITUDE',
                         lon_col: str = 'LONGITUDE', weight_col: str = 'FAILURE_RATE',
-                        zoom: int = 10) -> pdk.Deck:
+                        zoom: int = 10, max_points: int = 10000) -> pdk.Deck:
     """
     Create heatmap layer using PyDeck
     
@@ -59,35 +200,50 @@ def create_heatmap_layer(df: pd.DataFrame, lat_col: str = 'LATITUDE',
         lon_col: Longitude column name
         weight_col: Column to use as heatmap weight
         zoom: Initial zoom level
+        max_points: Most points to send; larger inputs are summed onto a grid
+            of about this many cells before they leave the server
     
     Returns:
         pdk.Deck: PyDeck deck object
     """
-    # Normalize weights to 0-1 range
-    df_copy = df.copy()
-    if weight_col in df_copy.columns:
-        max_weight = df_copy[weight_col].max()
-        if max_weight > 0:
-            df_copy['weight'] = df_copy[weight_col] / max_weight
-        else:
-            df_copy['weight'] = 0
+    # Normalize weights to 0-1 range straight from the column array
+    if weight_col in df.columns:
+        weights = normalize_weights(df[weight_col].to_numpy(dtype=np.float64))
     else:
-        df_copy['weight'] = 1
+        weights = np.ones(len(df))
     
-    # Calculate center point
-    center_lat = df_copy[lat_col].mean()
-    center_lon = df_copy[lon_col].mean()
+    lons = df[lon_col].to_numpy(dtype=np.float64)
+    lats = df[lat_col].to_numpy(dtype=np.float64)
+    
+    # Center on a strided sample; the view does not need an exact mean
+    center_lat, center_lon = get_view_center(lats, lons)
+    
+    # Pre-aggregate dense inputs so the browser receives one point per cell
+    if len(df) > max_points:
+        lats, lons, weights = grid_aggregate(lats, lons, weights, max(int(np.sqrt(max_points)), 1))
+        weights = normalize_weights(weights)
+    
+    # Send only what the layer reads, under short keys and rounded to a
+    # precision the map can show (~1 m), since every row is encoded as JSON
+    layer_data = pd.DataFrame({
+        'lon': lons.round(5),
+        'lat': lats.round(5),
+        'weight': weights.round(3)
+    })
     
     # Create heatmap layer
     heatmap_layer = pdk.Layer(
         "HeatmapLayer",
-        data=df_copy,
-        get_position=f"[{lon_col}, {lat_col}]",
+        data=layer_data,
+        get_position="[lon, lat]",
         get_weight="weight",
         radiusPixels=60,
         intensity=1,
         threshold=0.05,
-        pickable=True
+        colorRange=HEATMAP_COLOR_RANGE,
+        aggregation="SUM",
+        # Heatmap cells cannot be picked; hit-testing them only costs GPU time
+        pickable=False
     )
     
     # Create deck
@@ -98,16 +254,17 @@ def create_heatmap_layer(df: pd.DataFrame, lat_col: str = 'LATITUDE',
             longitude=center_lon,
             zoom=zoom,
             pitch=0
-        ),
-        tooltip={"text": f"{weight_col}: {{weight}}"}
+        )
     )
     
     return deck
 
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_scatter_plot(df: pd.DataFrame, x_col: str, y_col: str,
                        color_col: Optional[str] = None,
                        title: str = "Scatter Plot",
-                       trendline: bool = True) -> go.Figure:
+                       trendline: bool = True,
+                       rasterize: Optional[bool] = None) -> go.Figure:
     """
     Create scatter plot with optional trendline
     
@@ -118,32 +275,127 @@ def create_scatter_plot(df: pd.DataFrame, x_col: str, y_col: str,
         color_col: Optional color grouping column
         title: Plot title
         trendline: Whether to add trendline
+        rasterize: Draw a binned density image instead of markers; by
+            default only above RASTERIZE_MIN_POINTS rows
     
     Returns:
         go.Figure: Plotly figure object
     """
+    if rasterize is None:
+        rasterize = len(df) > RASTERIZE_MIN_POINTS
+    if rasterize:
+        return create_density_plot(df, x_col, y_col, color_col=color_col, title=title)
+    
+    import plotly.express as px
+    
+    fig = px.scatter(
+        df, x=x_col, y=y_col, color=color_col,
+        title=title,
+        labels={x_col: format_column_label(x_col),
+               y_col: format_column_label(y_col)}
+    )
+    
     if trendline:
-        fig = px.scatter(
-            df, x=x_col, y=y_col, color=color_col,
-            title=title, trendline="ols",
-            labels={x_col: x_col.replace('_', ' ').title(),
-                   y_col: y_col.replace('_', ' ').title()}
+        # One least-squares line per colour group (or for all points when the
+        # colour is continuous), drawn in the group's marker colour; px treats
+        # bool colours as two discrete groups
+        if color_col is not None and (not pd.api.types.is_numeric_dtype(df[color_col])
+                                      or pd.api.types.is_bool_dtype(df[color_col])):
+            groups = df.groupby(color_col, sort=False, observed=True)
+        else:
+            groups = [(None, df)]
+        colors = {trace.name: trace.marker.color for trace in fig.data}
+        
+        lines = []
+        for group, group_df in groups:
+            fit = fit_trendline(group_df[x_col].to_numpy(), group_df[y_col].to_numpy())
+            if fit is None:
+                continue
+            color = colors.get(str(group)) if group is not None else None
+            lines.append(go.Scatter(
+                x=fit[0],
+                y=fit[1],
+                mode='lines',
+                name=f"{group} trend" if group is not None else "Trend",
+                line=dict(color=color if isinstance(color, str) else None),
+                showlegend=False
+            ))
+        fig.add_traces(lines)
+    
+    fig.update_layout(
+        height=500,
+        hovermode='closest'
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def create_density_plot(df: pd.DataFrame, x_col: str, y_col: str,
+                        color_col: Optional[str] = None,
+                        title: str = "Scatter Plot",
+                        width: int = 800, height: int = 500) -> go.Figure:
+    """
+    Create a rasterized scatter plot for point counts too large for markers
+    
+    Points are binned into a width x height grid on the server, so the figure
+    size depends on the grid rather than on the number of rows.
+    
+    Args:
+        df: DataFrame with data
+        x_col: X-axis column
+        y_col: Y-axis column
+        color_col: Optional numeric column averaged per bin; point counts
+            are shown otherwise
+        title: Plot title
+        width: Bins along the x axis
+        height: Bins along the y axis
+    
+    Returns:
+        go.Figure: Plotly figure object
+    """
+    x = df[x_col].to_numpy(dtype=np.float64)
+    y = df[y_col].to_numpy(dtype=np.float64)
+    located = np.isfinite(x) & np.isfinite(y)
+    
+    counts, x_edges, y_edges = np.histogram2d(x[located], y[located], bins=(width, height))
+    if color_col is not None and pd.api.types.is_numeric_dtype(df[color_col]):
+        values = df[color_col].to_numpy(dtype=np.float64)[located]
+        # Average only the points that have a value, so a missing one neither
+        # adds to a bin's sum nor to its count
+        valued = np.isfinite(values)
+        sums, _, _ = np.histogram2d(
+            x[located], y[located], bins=(x_edges, y_edges), weights=np.where(valued, values, 0.0)
         )
-    else:
-        fig = px.scatter(
-            df, x=x_col, y=y_col, color=color_col,
-            title=title,
-            labels={x_col: x_col.replace('_', ' ').title(),
-                   y_col: y_col.replace('_', ' ').title()}
+        valued_counts, _, _ = np.histogram2d(
+            x[located], y[located], bins=(x_edges, y_edges), weights=valued
         )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = sums / valued_counts
+        z_title = format_column_label(color_col)
+    else:
+        z = np.where(counts > 0, counts, np.nan)
+        z_title = "Points"
+    
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=z.T,
+        colorscale="Viridis",
+        colorbar={'title': z_title},
+        hoverongaps=False
+    ))
     
     fig.update_layout(
+        title=title,
+        xaxis_title=format_column_label(x_col),
+        yaxis_title=format_column_label(y_col),
         height=500,
         hovermode='closest'
     )
     
     return fig
 
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_bar_chart(df: pd.DataFrame, x_col: str, y_col: str,
                     title: str = "Bar Chart", orientation: str = 'v',
                     color_col: Optional[str] = None) -> go.Figure:
@@ -161,12 +413,26 @@ def create_bar_chart(df: pd.DataFrame, x_col: str, y_col: str,
     Returns:
         go.Figure: Plotly figure object
     """
-    fig = px.bar(
-        df, x=x_col, y=y_col, color=color_col,
-        title=title, orientation=orientation,
-        labels={x_col: x_col.replace('_', ' ').title(),
-               y_col: y_col.replace('_', ' ').title()}
-    )
+    if color_col is None:
+        # A single uncolored series needs none of plotly.express's grouping or
+        # color mapping, so build the trace directly
+        fig = go.Figure(go.Bar(
+            x=df[x_col].to_numpy(), y=df[y_col].to_numpy(), orientation=orientation
+        ))
+        fig.update_layout(
+            title=title,
+            xaxis_title=format_column_label(x_col),
+            yaxis_title=format_column_label(y_col)
+        )
+    else:
+        import plotly.express as px
+        
+        fig = px.bar(
+            df, x=x_col, y=y_col, color=color_col,
+            title=title, orientation=orientation,
+            labels={x_col: format_column_label(x_col),
+                   y_col: format_column_label(y_col)}
+        )
     
     fig.update_layout(
         height=400,
@@ -175,8 +441,10 @@ def create_bar_chart(df: pd.DataFrame, x_col: str, y_col: str,
     
     return fig
 
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_line_chart(df: pd.DataFrame, x_col: str, y_cols: List[str],
-                     title: str = "Time Series", smooth: bool = False) -> go.Figure:
+                     title: str = "Time Series", smooth: bool = False,
+                     max_points: int = 5000) -> go.Figure:
     """
     Create line chart for time series data
     
@@ -186,28 +454,33 @@ def create_line_chart(df: pd.DataFrame, x_col: str, y_cols: List[str],
         y_cols: List of Y-axis columns
         title: Chart title
         smooth: Whether to apply smoothing
+        max_points: Most points per line; longer series are min/max downsampled
     
     Returns:
         go.Figure: Plotly figure object
     """
-    fig = go.Figure()
+    x_data = df[x_col].to_numpy()
+    y_data = df[y_cols].to_numpy(dtype=np.float64)
+    if smooth:
+        # One pass smooths every column
+        y_data = rolling_mean(y_data, 7)
     
-    for col in y_cols:
-        if smooth:
-            y_data = df[col].rolling(window=7, min_periods=1).mean()
-        else:
-            y_data = df[col]
-        
-        fig.add_trace(go.Scatter(
-            x=df[x_col],
-            y=y_data,
+    shown = [downsample_minmax(y_data[:, i], max_points) for i in range(len(y_cols))]
+    
+    fig = go.Figure()
+    fig.add_traces([
+        go.Scatter(
+            x=x_data[keep],
+            y=y_data[keep, i],
             mode='lines+markers',
-            name=col.replace('_', ' ').title()
-        ))
+            name=format_column_label(col)
+        )
+        for i, (col, keep) in enumerate(zip(y_cols, shown))
+    ])
     
     fig.update_layout(
         title=title,
-        xaxis_title=x_col.replace('_', ' ').title(),
+        xaxis_title=format_column_label(x_col),
         yaxis_title="Value",
         height=500,
         hovermode='x unified'
@@ -215,6 +488,7 @@ def create_line_chart(df: pd.DataFrame, x_col: str, y_cols: List[str],
     
     return fig
 
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_gauge_chart(value: float, title: str, max_value: float = 100,
                       threshold_colors: Optional[List[dict]] = None) -> go.Figure:
     """
@@ -229,31 +503,15 @@ def create_gauge_chart(value: float, title: str, max_value: float = 100,
     Returns:
         go.Figure: Plotly figure object
     """
-    if threshold_colors is None:
-        threshold_colors = [
-            {'range': [0, 33], 'color': "lightgreen"},
-            {'range': [33, 66], 'color': "yellow"},
-            {'range': [66, 100], 'color': "red"}
-        ]
-    
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=value,
-        title={'text': title},
-        delta={'reference': max_value * 0.7},
-        gauge={
-            'axis': {'range': [None, max_value]},
-            'bar': {'color': "darkblue"},
-            'steps': threshold_colors,
-            'threshold': {
-                'line': {'color': "red", 'width': 4},
-                'thickness': 0.75,
-                'value': max_value * 0.9
-            }
-        }
-    ))
-    
-    fig.update_layout(height=300)
+    fig = go.Figure(GAUGE_PROTOTYPE)
+    gauge = fig.data[0]
+    gauge.value = value
+    gauge.title.text = title
+    gauge.delta.reference = max_value * 0.7
+    gauge.gauge.axis.range = [None, max_value]
+    gauge.gauge.threshold.value = max_value * 0.9
+    if threshold_colors is not None:
+        gauge.gauge.steps = threshold_colors
     
     return fig
 